@@ -0,0 +1,98 @@
+import os
+import sys
+import tempfile
+
+import llama_parser
+import metrics
+import ollama_client
+import simple_parser
+from profile_llm import llm_profile_async, run_blocking
+
+# ----------------------------
+# ASYNCIO PARSER API
+# ----------------------------
+# Per flow: the LLM profiling it shares with simple_parser or llama_parser;
+# loading and the keyword fallback are picked by name below
+FLOWS = {
+    "simple": simple_parser.PROFILE_FLOW,
+    "llama": llama_parser.PROFILE_FLOW,
+}
+
+
+def _load(flow, path, stream):
+    """Parse, extract and deduplicate one export (runs in the executor)."""
+    if flow == "simple":
+        conversations, _ = simple_parser.load_conversations(path, stream)
+        return simple_parser.dedup_records(conversations)
+    return llama_parser.parse_json_file(path, stream)
+
+
+def _fallback(flow, user_messages, conversations):
+    if not user_messages:
+        return simple_parser.create_fallback_profile()
+    with metrics.span("fallback", user_messages=len(user_messages)):
+        if flow == "simple":
+            return simple_parser.create_fallback_profile_from_messages(user_messages, conversations)
+        return llama_parser.create_fallback_profile(user_messages, conversations)
+
+
+async def extract_profile(source, flow="simple", stream=False, map_reduce=False, concurrency=None,
+                          executor=None, timeout=ollama_client.DEFAULT_TIMEOUT, with_metrics=False):
+    """Profile one export without blocking the event loop.
+
+    `source` is a path to a JSON or ZIP export, or the uploaded bytes of
+    one. `flow` picks the simple_parser ("simple") or llama_parser
+    ("llama") pipeline. Decoding, extraction, sampling and keyword
+    scanning run on `executor` (default: the loop's thread pool; pass a
+    ProcessPoolExecutor to spread CPU work across cores). Ollama is called
+    with the non-blocking client, so one loop can serve many uploads at
+    once; the client's shared request limit bounds them all together.
+    Like the CLIs, this always returns a profile, falling back to keyword
+    analysis when the LLM can't produce one.
+
+    Each call records its spans in its own metrics scope, as worker jobs
+    do, so a long-running server does not pile them up. With
+    `with_metrics` it returns (profile, metrics record) instead.
+    """
+    if flow not in FLOWS:
+        raise ValueError(f"Unknown flow {flow!r}, expected one of {sorted(FLOWS)}")
+
+    with metrics.collecting() as collector:
+        profile = await _extract_profile(source, flow, stream, map_reduce, concurrency, executor, timeout)
+    if with_metrics:
+        return profile, collector.to_record(command="async_parser", flow=flow)
+    return profile
+
+
+async def _extract_profile(source, flow, stream, map_reduce, concurrency, executor, timeout):
+    spooled = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        spooled = await run_blocking(None, _spool, bytes(source))
+        source = spooled
+
+    try:
+        try:
+            conversations, user_messages = await run_blocking(executor, _load, flow, os.fspath(source), stream)
+        except Exception as e:
+            print(f"Error: {e!r}", file=sys.stderr)
+            conversations, user_messages = [], []
+
+        profile = None
+        if user_messages:
+            profile = await llm_profile_async(FLOWS[flow], user_messages, conversations, map_reduce=map_reduce,
+                                              concurrency=concurrency, timeout=timeout, executor=executor)
+        if profile is not None:
+            return profile
+        return await run_blocking(executor, _fallback, flow, user_messages, conversations)
+    finally:
+        if spooled:
+            os.remove(spooled)
+
+
+def _spool(data):
+    """Write uploaded bytes to a temp file the path-based loaders can read."""
+    suffix = ".zip" if data[:4] == b"PK\x03\x04" else ".json"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Profile many users' exports from a manifest, writing NDJSON as results finish."""
+import argparse
+import collections
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import json_backend
+import metrics
+import ollama_client
+from export_source import export_size
+from llama_parser import analyze_with_llama, parse_json_file_with_metrics
+from llm_cache import cache
+
+# ----------------------------
+# RESOURCE ESTIMATES
+# ----------------------------
+# Rough peak Python heap per byte of export JSON, for json.load vs streaming
+LOADED_MEMORY_FACTOR = 6
+STREAMED_MEMORY_FACTOR = 2
+
+
+def source_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+def plan_job(job, stream, memory_budget, parse_workers):
+    """Fill in stream mode and the memory cost charged against the budget.
+
+    Exports too big to json.load within one worker's share of the budget
+    are streamed instead.
+    """
+    size = export_size(job["json_file"])
+    job_stream = job.get("stream", stream) or size * LOADED_MEMORY_FACTOR > memory_budget / parse_workers
+    factor = STREAMED_MEMORY_FACTOR if job_stream else LOADED_MEMORY_FACTOR
+    return dict(job, stream=job_stream, cost=size * factor)
+
+
+# ----------------------------
+# MANIFEST AND CHECKPOINT
+# ----------------------------
+def read_manifest(path):
+    """Yield jobs from a manifest: one JSON object ({"id", "json_file", ...})
+    or one bare export path per line."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job = json_backend.loads(line) if line.startswith("{") else {"json_file": line}
+            # Relative paths are relative to the manifest, not the cwd
+            job["json_file"] = os.path.join(base, job["json_file"])
+            job.setdefault("id", job["json_file"])
+            yield job
+
+
+def load_checkpoint(path):
+    """Map of id -> source signature for every finished record in `path`.
+
+    The output file is the checkpoint. A torn last line left by a crash is
+    truncated so appending resumes on a clean line boundary. Error records
+    are not counted as finished, so they are retried.
+    """
+    finished = {}
+    if not os.path.exists(path):
+        return finished
+
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json_backend.loads(line)
+            except ValueError:
+                break
+            good_bytes += len(line)
+            if record.get("status") != "error":
+                finished[record["id"]] = record.get("source")
+
+    if good_bytes < os.path.getsize(path):
+        print(f"Truncating partial record at byte {good_bytes} of {path}", file=sys.stderr)
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+    return finished
+
+
+# ----------------------------
+# STAGES
+# ----------------------------
+def profile_stage(user_messages, conversations, map_reduce):
+    """LLM stage, run on the LLM thread pool; returns (profile, spans)."""
+    with metrics.collecting() as collector:
+        profile = analyze_with_llama(user_messages, conversations, map_reduce=map_reduce)
+    return profile, collector.spans
+
+
+def make_record(job, status, profile=None, error=None, spans=()):
+    collector = metrics.MetricsCollector()
+    collector.extend(spans)
+    record = {
+        "id": job["id"],
+        "json_file": job["json_file"],
+        "source": job.get("source"),
+        "status": status,
+        "profile": profile,
+        "fallback": any(s["stage"] == "fallback" for s in spans),
+        "stages": collector.stages(),
+    }
+    if error:
+        record["error"] = error
+    return record
+
+
+def add_stages(totals, stages):
+    """Fold one record's per-stage totals into the running batch totals."""
+    for stage, counters in stages.items():
+        target = totals.setdefault(stage, {})
+        for key, value in counters.items():
+            target[key] = round(target.get(key, 0) + value, 3)
+
+
+def run_batch(manifest_path, output_path, parse_workers=None, llm_concurrency=2,
+              memory_budget_mb=2048, stream=False, map_reduce=False, restart=False):
+    """Profile every export in the manifest, appending one NDJSON record per user.
+
+    Parsing runs on a process pool and LLM analysis on a thread pool, so
+    both stages stay busy. A job holds its estimated memory cost from parse
+    admission until its record is written. New parses are only admitted
+    while the total fits in `memory_budget_mb`, which also bounds how many
+    parsed exports can queue up behind a slow LLM stage. A job bigger than
+    the whole budget still runs, but only on its own.
+
+    Exports whose file changed since their record was written are profiled
+    again and get a newer record appended, so readers should keep the last
+    record per id.
+
+    Returns (statuses, stages): a Counter of record statuses written in
+    this run and per-stage totals summed over its records. Spans are only
+    kept per record, so memory stays flat over thousands of exports.
+    """
+    parse_workers = parse_workers or os.cpu_count() or 1
+    memory_budget = memory_budget_mb * 1024 * 1024
+    # Map-reduce windows fan out further, so bound the requests themselves
+    ollama_client.client.set_max_in_flight(llm_concurrency)
+
+    if restart and os.path.exists(output_path):
+        os.remove(output_path)
+    finished = load_checkpoint(output_path)
+
+    queue = collections.deque()
+    statuses = collections.Counter()
+    stages = {}
+    for job in read_manifest(manifest_path):
+        try:
+            job["source"] = source_signature(job["json_file"])
+        except OSError as e:
+            job["source"] = None
+            queue.append(dict(job, missing=str(e)))
+            continue
+        if finished.get(job["id"]) == job["source"]:
+            statuses["skipped"] += 1
+            continue
+        queue.append(job)
+
+    print(f"Batch: {len(queue)} exports to profile, {statuses['skipped']} already done", file=sys.stderr)
+
+    used = 0
+    inflight = {}
+    total = len(queue)
+    written = 0
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool:
+
+        def write(job, status, cost, profile=None, error=None, spans=()):
+            nonlocal used, written
+            record = make_record(job, status, profile, error, spans)
+            out.write(json_backend.dumps(record) + "\n")
+            out.flush()
+            add_stages(stages, record["stages"])
+            used -= cost
+            written += 1
+            statuses[record["status"]] += 1
+            print(f"[{written}/{total}] {record['id']}: {record['status']}", file=sys.stderr)
+
+        while queue or inflight:
+            # Admit parses while memory allows; cap the parse backlog too
+            parsing = sum(1 for stage, _ in inflight.values() if stage == "parse")
+            while queue and parsing < 2 * parse_workers:
+                job = queue[0]
+                if job.get("missing"):
+                    queue.popleft()
+                    write(job, "error", 0, error=job["missing"])
+                    continue
+                if "cost" not in job:
+                    try:
+                        job = queue[0] = plan_job(job, stream, memory_budget, parse_workers)
+                    except (OSError, ValueError) as e:
+                        queue.popleft()
+                        write(job, "error", 0, error=str(e))
+                        continue
+                if used and used + job["cost"] > memory_budget:
+                    break
+                queue.popleft()
+                used += job["cost"]
+                future = parse_pool.submit(parse_json_file_with_metrics, job["json_file"], job["stream"])
+                inflight[future] = ("parse", job)
+                parsing += 1
+
+            if not inflight:
+                continue
+
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, job = inflight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    write(job, "error", job["cost"], error=f"{stage}: {e}", spans=job.get("spans", []))
+                    continue
+
+                if stage == "parse":
+                    conversations, user_messages, spans = result
+                    if not user_messages:
+                        write(job, "empty", job["cost"], spans=spans)
+                        continue
+                    llm_future = llm_pool.submit(profile_stage, user_messages, conversations,
+                                                 job.get("map_reduce", map_reduce))
+                    # Keep parse spans with the job until its record is written
+                    inflight[llm_future] = ("llm", dict(job, spans=spans))
+                else:
+                    profile, spans = result
+                    write(job, "ok", job["cost"], profile, spans=job["spans"] + spans)
+
+    return statuses, stages
+
+
+# ----------------------------
+# MAIN ENTRY POINT
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile many users' exports listed in a manifest.")
+    parser.add_argument("--manifest", required=True, help="One export per line: a path, or JSON {\"id\", \"json_file\", \"stream\", \"map_reduce\"}")
+    parser.add_argument("--output", default="profiles.ndjson", help="NDJSON output, also the resume checkpoint")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Processes used for JSON parsing (default: CPU count)")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="Maximum Ollama requests in flight")
+    parser.add_argument("--memory-budget-mb", type=int, default=2048, help="Estimated memory allowed for exports being parsed or awaiting the LLM")
+    parser.add_argument("--stream", action="store_true", help="Stream every export (large ones are streamed regardless)")
+    parser.add_argument("--map-reduce", action="store_true", help="Profile every conversation in context-sized chunks and merge the results")
+    parser.add_argument("--restart", action="store_true", help="Ignore the existing output and start over")
+    parser.add_argument("--metrics-file", help="Append the JSON metrics record to this file instead of stderr")
+    args = parser.parse_args()
+
+    statuses, stages = run_batch(args.manifest, args.output, parse_workers=args.parse_workers,
+                                 llm_concurrency=args.llm_concurrency, memory_budget_mb=args.memory_budget_mb,
+                                 stream=args.stream, map_reduce=args.map_reduce, restart=args.restart)
+
+    # Per-export spans are already in each record; the summary only totals them
+    record = metrics.current().to_record(command="batch_profiles", statuses=dict(statuses),
+                                         cache=cache.stats())
+    record["stages"] = stages
+    del record["spans"]
+    metrics.emit(record, args.metrics_file)
+    print(f"✅ Batch finished: {dict(statuses)}, results in {args.output}")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Benchmark the parser pipeline on synthetic exports.
+
+Each benchmark runs in its own process so peak RSS is attributable to it.
+Reports wall-time percentiles, messages/s, MB/s and peak RSS. MB/s is
+only reported for benchmarks that read the whole export file; the others
+start from already-parsed data.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+BENCHMARKS = [
+    "parse_json_file",
+    "parse_json_file_stream",
+    "extract_conversations_dynamic",
+    "create_fallback_profile",
+    "create_fallback_profile_from_messages",
+    "cli_end_to_end",
+]
+# Benchmarks whose timed work includes reading and decoding the export
+READS_EXPORT = {"parse_json_file", "parse_json_file_stream", "cli_end_to_end"}
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _time(fn, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _run_benchmark(name, path, repeat, stub_url):
+    """Body of one isolated benchmark; returns (durations, message_count, rss_who)."""
+    import llama_parser
+    import simple_parser
+
+    def count_messages(conversations):
+        return sum(len(c["messages"]) for c in conversations)
+
+    if name == "parse_json_file":
+        convs, _ = llama_parser.parse_json_file(path)
+        return _time(lambda: llama_parser.parse_json_file(path), repeat), count_messages(convs), resource.RUSAGE_SELF
+
+    if name == "parse_json_file_stream":
+        convs, _ = llama_parser.parse_json_file(path, stream=True)
+        return (_time(lambda: llama_parser.parse_json_file(path, stream=True), repeat),
+                count_messages(convs), resource.RUSAGE_SELF)
+
+    if name == "extract_conversations_dynamic":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        structure = {"schema": "chatgpt_mapping"}
+        convs, _ = simple_parser.extract_conversations_dynamic(data, structure)
+        return (_time(lambda: simple_parser.extract_conversations_dynamic(data, structure), repeat),
+                count_messages(convs), resource.RUSAGE_SELF)
+
+    if name == "create_fallback_profile":
+        convs, msgs = llama_parser.parse_json_file(path)
+        return _time(lambda: llama_parser.create_fallback_profile(msgs, convs), repeat), len(msgs), resource.RUSAGE_SELF
+
+    if name == "create_fallback_profile_from_messages":
+        convs, msgs = llama_parser.parse_json_file(path)
+        return (_time(lambda: simple_parser.create_fallback_profile_from_messages(msgs, convs), repeat),
+                len(msgs), resource.RUSAGE_SELF)
+
+    if name == "cli_end_to_end":
+        env = dict(os.environ, OLLAMA_ENDPOINTS=stub_url, LLM_CACHE_MAX_BYTES="0")
+        cmd = [sys.executable, os.path.join(HERE, "simple_parser.py"), "--json-file", path]
+        convs, _ = simple_parser.stream_conversations_dynamic(path)
+
+        def run():
+            subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+        return _time(run, repeat), count_messages(convs), resource.RUSAGE_CHILDREN
+
+    raise ValueError(f"Unknown benchmark {name}")
+
+
+def _child(name, path, repeat, stub_url, conn):
+    # Parser diagnostics would drown the report
+    sys.stderr = open(os.devnull, "w")
+    try:
+        durations, messages, who = _run_benchmark(name, path, repeat, stub_url)
+        conn.send({"durations": durations, "messages": messages, "peak_rss_mb": _peak_rss_mb(who)})
+    except Exception as e:
+        conn.send({"error": repr(e)})
+    finally:
+        conn.close()
+
+
+def run_isolated(name, path, repeat, stub_url):
+    parent, child = multiprocessing.Pipe(duplex=False)
+    proc = multiprocessing.Process(target=_child, args=(name, path, repeat, stub_url, child))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def summarize(name, result, size_bytes):
+    if "error" in result:
+        return {"benchmark": name, "error": result["error"]}
+    durations = result["durations"]
+    median = statistics.median(durations)
+    return {
+        "benchmark": name,
+        "runs": len(durations),
+        "p50_s": median,
+        "p95_s": _percentile(durations, 95),
+        "p99_s": _percentile(durations, 99),
+        "max_s": max(durations),
+        "messages": result["messages"],
+        "messages_per_s": result["messages"] / median if median else None,
+        "mb_per_s": size_bytes / 1024 / 1024 / median if median and name in READS_EXPORT else None,
+        "peak_rss_mb": result["peak_rss_mb"],
+    }
+
+
+def print_report(rows, size_bytes):
+    print(f"Export size: {size_bytes / 1024 / 1024:.1f} MB")
+    print(f"{'benchmark':40} {'p50':>9} {'p95':>9} {'msgs/s':>12} {'MB/s':>9} {'RSS MB':>9}")
+    for row in rows:
+        if "error" in row:
+            print(f"{row['benchmark']:40} ERROR {row['error']}")
+            continue
+        mb_per_s = f"{row['mb_per_s']:9.1f}" if row["mb_per_s"] is not None else f"{'-':>9}"
+        print(f"{row['benchmark']:40} {row['p50_s'] * 1000:8.1f}ms {row['p95_s'] * 1000:8.1f}ms "
+              f"{row['messages_per_s']:12.0f} {mb_per_s} {row['peak_rss_mb']:9.1f}")
+
+
+if __name__ == "__main__":
+    from stub_ollama import start_stub_server
+    from synthetic_export import write_export
+
+    parser = argparse.ArgumentParser(description="Benchmark the conversation parsers")
+    parser.add_argument("--json-file", help="Existing export to benchmark (default: generate one)")
+    parser.add_argument("--size-mb", type=float, default=5, help="Size of the generated export")
+    parser.add_argument("--branch-factor", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--only", action="append", choices=BENCHMARKS, help="Run only these benchmarks")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub Ollama first-token latency (s)")
+    parser.add_argument("--json", dest="json_out", help="Also write results as JSON to this path")
+    args = parser.parse_args()
+
+    path = args.json_file
+    tmpdir = None
+    if not path:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, "conversations.json")
+        write_export(path, target_mb=args.size_mb, branch_factor=args.branch_factor)
+
+    server, stub_url = start_stub_server(first_token_latency=args.llm_latency)
+    size_bytes = os.path.getsize(path)
+
+    rows = [summarize(name, run_isolated(name, path, args.repeat, stub_url), size_bytes)
+            for name in (args.only or BENCHMARKS)]
+    print_report(rows, size_bytes)
+
+    if args.json_out:
+        with open(args.json_out, "w") as out:
+            json.dump({"size_bytes": size_bytes, "results": rows}, out, indent=2)
+
+    server.shutdown()
+    if tmpdir:
+        tmpdir.cleanup()
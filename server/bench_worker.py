@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Compare per-request latency of exec'ing simple_parser.py against worker mode."""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PARSER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simple_parser.py")
+
+
+def summarize(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{label:>8}: n={len(latencies)} mean={statistics.mean(latencies) * 1000:.1f}ms "
+          f"p50={statistics.median(latencies) * 1000:.1f}ms p95={p95 * 1000:.1f}ms")
+
+
+def bench_exec(json_file, requests_count):
+    """One interpreter per request, as parseWithLLaMA does today"""
+    latencies = []
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, PARSER, "--json-file", json_file],
+                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_worker(json_file, requests_count):
+    """One long-lived worker, jobs sent sequentially over stdin"""
+    worker = subprocess.Popen([sys.executable, PARSER, "--worker", "--concurrency", "1"],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    latencies = []
+    try:
+        for i in range(requests_count):
+            start = time.perf_counter()
+            worker.stdin.write(json.dumps({"id": i, "json_file": json_file}) + "\n")
+            worker.stdin.flush()
+            json.loads(worker.stdout.readline())
+            latencies.append(time.perf_counter() - start)
+    finally:
+        worker.stdin.close()
+        worker.wait()
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark exec vs worker parser latency")
+    parser.add_argument("--json-file", required=True, help="Export to parse on every request")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per mode")
+    args = parser.parse_args()
+
+    json_file = os.path.abspath(args.json_file)
+    summarize("exec", bench_exec(json_file, args.requests))
+    summarize("worker", bench_worker(json_file, args.requests))
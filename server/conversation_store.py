@@ -0,0 +1,191 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+
+# ----------------------------
+# COLUMNAR CONVERSATION STORE
+# ----------------------------
+MAGIC = b"LLMBCS01"
+ROLES = ["user", "assistant", "system", "tool"]
+OTHER_ROLE = len(ROLES)
+_ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+# name -> array typecode; order is the on-disk section order
+_COLUMNS = [
+    ("timestamps", "d"),     # per message, NaN when missing
+    ("text_offsets", "Q"),   # per message + 1, into the text buffer
+    ("title_offsets", "Q"),  # per conversation + 1, into the title buffer
+    ("conv_offsets", "Q"),   # per conversation + 1, into the message columns
+    ("roles", "b"),          # per message, index into ROLES
+]
+
+
+def _source_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+class ConversationStore:
+    """Extracted conversations packed into flat typed columns.
+
+    Roles are small ints, timestamps an array('d'), and message texts and
+    titles live in two contiguous UTF-8 buffers addressed by offsets, so
+    there is no per-message dict overhead. A saved store is reopened with
+    mmap: columns are zero-copy memoryviews and text is decoded only when a
+    message is actually read.
+    """
+
+    def __init__(self, columns, text, titles, source=None):
+        self.timestamps = columns["timestamps"]
+        self.text_offsets = columns["text_offsets"]
+        self.title_offsets = columns["title_offsets"]
+        self.conv_offsets = columns["conv_offsets"]
+        self.roles = columns["roles"]
+        self._text = text
+        self._titles = titles
+        self.source = source
+        self._mmap = None
+
+    @classmethod
+    def from_records(cls, records):
+        """Pack an iterable of {title, messages} records (may be a generator)."""
+        columns = {name: array(code) for name, code in _COLUMNS}
+        text = bytearray()
+        titles = bytearray()
+        columns["text_offsets"].append(0)
+        columns["title_offsets"].append(0)
+        columns["conv_offsets"].append(0)
+
+        for record in records:
+            titles += str(record.get("title", "Unknown")).encode("utf-8")
+            columns["title_offsets"].append(len(titles))
+            for m in record["messages"]:
+                columns["roles"].append(_ROLE_CODES.get(m.get("role"), OTHER_ROLE))
+                ts = m.get("timestamp")
+                columns["timestamps"].append(float(ts) if isinstance(ts, (int, float)) else float("nan"))
+                text += str(m["content"]).encode("utf-8")
+                columns["text_offsets"].append(len(text))
+            columns["conv_offsets"].append(len(columns["roles"]))
+
+        return cls(columns, text, titles)
+
+    def __len__(self):
+        return len(self.conv_offsets) - 1
+
+    @property
+    def message_count(self):
+        return len(self.roles)
+
+    def text(self, i):
+        return bytes(self._text[self.text_offsets[i]:self.text_offsets[i + 1]]).decode("utf-8")
+
+    def title(self, c):
+        return bytes(self._titles[self.title_offsets[c]:self.title_offsets[c + 1]]).decode("utf-8")
+
+    def role(self, i):
+        code = self.roles[i]
+        return ROLES[code] if code < OTHER_ROLE else "other"
+
+    def role_count(self, role):
+        return bytes(self.roles).count(_ROLE_CODES.get(role, OTHER_ROLE))
+
+    def iter_texts(self, role=None):
+        """Yield message texts, optionally only for one role, without building dicts."""
+        code = _ROLE_CODES.get(role, OTHER_ROLE) if role else None
+        offsets = self.text_offsets
+        for i, r in enumerate(self.roles):
+            if code is None or r == code:
+                yield bytes(self._text[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def iter_titles(self):
+        for c in range(len(self)):
+            yield self.title(c)
+
+    def iter_conversation_texts(self, role="user"):
+        """Per conversation, (title, texts of its `role` messages), read straight from the columns."""
+        code = _ROLE_CODES.get(role, OTHER_ROLE)
+        offsets, roles, conv_offsets = self.text_offsets, self.roles, self.conv_offsets
+        for c in range(len(self)):
+            texts = [bytes(self._text[offsets[i]:offsets[i + 1]]).decode("utf-8")
+                     for i in range(conv_offsets[c], conv_offsets[c + 1]) if roles[i] == code]
+            yield self.title(c), texts
+
+    def iter_records(self):
+        """Yield {title, messages} dicts compatible with the rest of the pipeline."""
+        for c in range(len(self)):
+            messages = []
+            for i in range(self.conv_offsets[c], self.conv_offsets[c + 1]):
+                ts = self.timestamps[i]
+                messages.append({
+                    "role": self.role(i),
+                    "content": self.text(i),
+                    "timestamp": None if ts != ts else ts
+                })
+            yield {"title": self.title(c), "messages": messages}
+
+    # ----------------------------
+    # PERSISTENCE
+    # ----------------------------
+    def save(self, path, source_path=None):
+        """Write header + 8-byte aligned raw columns + text buffers, atomically."""
+        header = {
+            "source": _source_signature(source_path) if source_path else self.source,
+            "columns": [[name, code, len(getattr(self, name))] for name, code in _COLUMNS],
+            "text_bytes": len(self._text),
+            "title_bytes": len(self._titles),
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        preamble = MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(preamble)
+            for name, code in _COLUMNS:
+                f.write(b"\0" * (-f.tell() % 8))
+                column = getattr(self, name)
+                f.write(column.tobytes() if isinstance(column, array) else bytes(column))
+            f.write(self._text)
+            f.write(self._titles)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a saved store; columns are views into the mapping."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(mm)
+        if bytes(view[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a conversation store")
+        (header_len,) = struct.unpack("<Q", view[8:16])
+        header = json.loads(bytes(view[16:16 + header_len]))
+
+        pos = 16 + header_len
+        columns = {}
+        for name, code, length in header["columns"]:
+            pos += -pos % 8
+            size = array(code).itemsize * length
+            columns[name] = view[pos:pos + size].cast(code)
+            pos += size
+        text = view[pos:pos + header["text_bytes"]]
+        pos += header["text_bytes"]
+        titles = view[pos:pos + header["title_bytes"]]
+
+        store = cls(columns, text, titles, source=header.get("source"))
+        store._mmap = mm
+        return store
+
+    @staticmethod
+    def is_fresh(path, source_path):
+        """True if `path` holds a store built from the current `source_path`."""
+        try:
+            with open(path, "rb") as f:
+                if f.read(8) != MAGIC:
+                    return False
+                (header_len,) = struct.unpack("<Q", f.read(8))
+                header = json.loads(f.read(header_len))
+            return header.get("source") == _source_signature(source_path)
+        except (OSError, ValueError, struct.error):
+            return False
@@ -0,0 +1,58 @@
+# ----------------------------
+# CHATGPT MAPPING TRAVERSAL
+# ----------------------------
+def _active_path(mapping, current_node):
+    """Node ids on the active branch, leaf first."""
+    path = []
+    seen = set()
+
+    if current_node in mapping:
+        # Walk parent links from the node the user last saw back to the root
+        node_id = current_node
+        while node_id in mapping and node_id not in seen:
+            seen.add(node_id)
+            path.append(node_id)
+            node_id = mapping[node_id].get("parent")
+        return path
+
+    if not any(node.get("parent") in mapping for node in mapping.values()):
+        # Unlinked nodes (hand-built or legacy exports): fall back to time order
+        return sorted(mapping, key=lambda nid: ((mapping[nid].get("message") or {}).get("create_time") or 0),
+                      reverse=True)
+
+    # No usable current_node: start at the root and keep taking the
+    # newest child, which is where ChatGPT puts edits and regenerations
+    node_id = next((nid for nid, node in mapping.items()
+                    if node.get("parent") not in mapping), None)
+    while node_id in mapping and node_id not in seen:
+        seen.add(node_id)
+        path.append(node_id)
+        children = mapping[node_id].get("children") or []
+        node_id = children[-1] if children else None
+    path.reverse()
+    return path
+
+
+def message_text(message):
+    """All text parts of a message joined with newlines ('' if none)."""
+    content = message.get("content") or {}
+    parts = content.get("parts")
+    if parts is None:
+        text = content.get("text")
+        return text if isinstance(text, str) else ""
+    # Non-string parts are attachments (images, files); skip them
+    return "\n".join(p for p in parts if isinstance(p, str) and p)
+
+
+def iter_active_messages(conv):
+    """Yield the messages on a conversation's active branch, root first.
+
+    Only the branch ending at `current_node` is walked, so abandoned edits
+    and regenerations are skipped. This is O(n) in the branch length with no
+    sorting, and being a generator lets callers stop early.
+    """
+    mapping = conv.get("mapping") or {}
+    for node_id in reversed(_active_path(mapping, conv.get("current_node"))):
+        message = mapping[node_id].get("message")
+        if message:
+            yield message
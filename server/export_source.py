@@ -0,0 +1,48 @@
+import contextlib
+import io
+import os
+import zipfile
+
+# ----------------------------
+# EXPORT FILE SOURCES
+# ----------------------------
+EXPORT_MEMBER = "conversations.json"
+
+
+def is_zip_export(path):
+    return path.lower().endswith(".zip") or zipfile.is_zipfile(path)
+
+
+def find_export_member(archive):
+    """Name of the conversations.json member, preferring the shallowest one."""
+    candidates = [info.filename for info in archive.infolist()
+                  if not info.is_dir() and os.path.basename(info.filename) == EXPORT_MEMBER]
+    if not candidates:
+        raise FileNotFoundError(f"No {EXPORT_MEMBER} in archive")
+    return min(candidates, key=lambda name: (name.count("/"), name))
+
+
+@contextlib.contextmanager
+def open_export(path):
+    """Open a JSON export or a ChatGPT ZIP export as a text stream.
+
+    For archives, conversations.json is decompressed on the fly straight
+    from the member; nothing is extracted to disk and attachments and other
+    members are never read.
+    """
+    if not is_zip_export(path):
+        with open(path, "r", encoding="utf-8") as f:
+            yield f
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        with archive.open(find_export_member(archive)) as member:
+            yield io.TextIOWrapper(member, encoding="utf-8")
+
+
+def export_size(path):
+    """Uncompressed size in bytes of the conversations JSON behind `path`."""
+    if not is_zip_export(path):
+        return os.path.getsize(path)
+    with zipfile.ZipFile(path) as archive:
+        return archive.getinfo(find_export_member(archive)).file_size
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+
+# ----------------------------
+# INCREMENTAL PROFILE STATE
+# ----------------------------
+STATE_VERSION = 2
+
+
+def conversation_key(conv):
+    """(id, version) for a raw export conversation.
+
+    ChatGPT exports carry an id and an update_time; anything else falls
+    back to a hash of the conversation's content for both.
+    """
+    conv_id = conv.get("id") or conv.get("conversation_id")
+    version = conv.get("update_time")
+    if conv_id is None or version is None:
+        digest = hashlib.sha1(json.dumps(conv, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        conv_id = conv_id or digest
+        version = version if version is not None else digest
+    return str(conv_id), version
+
+
+class ProfileState:
+    """Compact per-user record of what has already been profiled.
+
+    Keeps, per conversation id, the version last counted and that
+    conversation's keyword counts, so a changed conversation can replace
+    its old contribution instead of being counted twice. The version the
+    LLM profile last covered is kept apart ("profiled"), so a failed LLM
+    call leaves the conversation pending for the next run. Also keeps the
+    running totals and the latest LLM profile.
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.conversations = data.get("conversations", {})
+        self.profile = data.get("profile")
+        self.message_count = data.get("message_count", 0)
+        self.text_counts = Counter(data.get("text_counts", {}))
+        self.title_counts = Counter(data.get("title_counts", {}))
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        if data.get("version") != STATE_VERSION:
+            # Unknown layout: start over rather than merge garbage
+            return cls()
+        return cls(data)
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": STATE_VERSION,
+                "message_count": self.message_count,
+                "profile": self.profile,
+                "text_counts": dict(self.text_counts),
+                "title_counts": dict(self.title_counts),
+                "conversations": self.conversations,
+            }, f)
+        os.replace(tmp_path, path)
+
+    def is_changed(self, key):
+        """True if the keyword counts have not seen this (id, version) yet."""
+        conv_id, version = key
+        seen = self.conversations.get(conv_id)
+        return seen is None or seen.get("version") != version
+
+    def needs_profile(self, key):
+        """True if the LLM profile does not cover this (id, version) yet."""
+        conv_id, version = key
+        seen = self.conversations.get(conv_id)
+        return self.profile is None or seen is None or seen.get("profiled") != version
+
+    def record(self, key, text_counts, title_counts, message_count):
+        """Replace a conversation's contribution with its latest counts."""
+        conv_id, version = key
+        old = self._drop(conv_id)
+        self.text_counts.update(text_counts)
+        self.title_counts.update(title_counts)
+        self.message_count += message_count
+        self.conversations[conv_id] = {
+            "version": version,
+            "profiled": old.get("profiled") if old else None,
+            "message_count": message_count,
+            "text_counts": {k: v for k, v in text_counts.items() if v},
+            "title_counts": {k: v for k, v in title_counts.items() if v},
+        }
+
+    def mark_profiled(self, keys):
+        """Record that the LLM profile now covers these (id, version) pairs."""
+        for conv_id, version in keys:
+            if conv_id in self.conversations:
+                self.conversations[conv_id]["profiled"] = version
+
+    def prune(self, live_ids):
+        """Forget conversations missing from the latest upload; returns how many."""
+        gone = [conv_id for conv_id in self.conversations if conv_id not in live_ids]
+        for conv_id in gone:
+            self._drop(conv_id)
+        return len(gone)
+
+    def _drop(self, conv_id):
+        old = self.conversations.pop(conv_id, None)
+        if old:
+            self.text_counts.subtract(old.get("text_counts", {}))
+            self.title_counts.subtract(old.get("title_counts", {}))
+            self.message_count -= old.get("message_count", 0)
+            # Drop keywords whose counts fell to zero
+            self.text_counts = +self.text_counts
+            self.title_counts = +self.title_counts
+        return old
@@ -0,0 +1,132 @@
+import importlib
+import json
+import os
+import threading
+
+# ----------------------------
+# PLUGGABLE JSON BACKEND
+# ----------------------------
+# Preference order when JSON_BACKEND is "auto"; "json" (stdlib) always works
+BACKENDS = ("orjson", "msgspec", "json")
+
+_lock = threading.Lock()
+_backend = None
+_export_decoder = None
+
+
+def _resolve():
+    """Import the configured backend on first use, keeping startup cheap."""
+    global _backend
+    with _lock:
+        if _backend is not None:
+            return _backend
+
+        wanted = os.environ.get("JSON_BACKEND", "auto").lower()
+        candidates = BACKENDS if wanted == "auto" else (wanted, "json")
+        for name in candidates:
+            try:
+                module = importlib.import_module("msgspec.json" if name == "msgspec" else name)
+            except ImportError:
+                continue
+            _backend = (name, module)
+            break
+        return _backend
+
+
+def backend_name():
+    return _resolve()[0]
+
+
+def loads(data):
+    """Decode a JSON document from str or bytes."""
+    name, module = _resolve()
+    if name == "orjson":
+        return module.loads(data)
+    if name == "msgspec":
+        return module.decode(data)
+    return module.loads(data)
+
+
+def load(fp):
+    return loads(fp.read())
+
+
+def dumps(obj, indent=None):
+    """Encode to a str; orjson only indents by 2, other widths use the stdlib."""
+    name, module = _resolve()
+    if name == "orjson" and indent in (None, 2):
+        option = module.OPT_NON_STR_KEYS | (module.OPT_INDENT_2 if indent else 0)
+        return module.dumps(obj, option=option, default=str).decode("utf-8")
+    if name == "msgspec" and indent is None:
+        return module.encode(obj, enc_hook=str).decode("utf-8")
+    return json.dumps(obj, indent=indent, default=str)
+
+
+def dump(obj, fp, indent=None):
+    fp.write(dumps(obj, indent=indent))
+
+
+# ----------------------------
+# TYPED CHATGPT EXPORT DECODING
+# ----------------------------
+def _chatgpt_export_decoder():
+    """msgspec decoder for list[Conversation] that skips every field we never read.
+
+    The types are non-total TypedDicts, so msgspec builds plain dicts
+    directly and absent fields stay absent, exactly what the .get()-based
+    extraction code expects.
+    """
+    global _export_decoder
+    if _export_decoder is not None:
+        return _export_decoder
+
+    from typing import Any, Dict, List, Optional, TypedDict
+
+    import msgspec
+
+    class Author(TypedDict, total=False):
+        role: Optional[str]
+
+    class Content(TypedDict, total=False):
+        parts: Optional[List[Any]]
+        text: Any
+
+    class Message(TypedDict, total=False):
+        author: Optional[Author]
+        content: Optional[Content]
+        create_time: Optional[float]
+
+    class Node(TypedDict, total=False):
+        parent: Optional[str]
+        children: Optional[List[str]]
+        message: Optional[Message]
+
+    class Conversation(TypedDict, total=False):
+        title: Any
+        current_node: Optional[str]
+        mapping: Optional[Dict[str, Node]]
+
+    _export_decoder = msgspec.json.Decoder(List[Conversation])
+    return _export_decoder
+
+
+def load_chatgpt_export(fp):
+    """Decode a ChatGPT conversations.json, keeping only the fields extraction reads.
+
+    With msgspec installed the export is decoded against typed dicts, so
+    the large unused parts of the tree (metadata, weights, attachments)
+    are never materialized. Anything that doesn't match the layout falls
+    back to a full decode with the active backend.
+    """
+    data = fp.read()
+    if os.environ.get("JSON_BACKEND", "auto").lower() not in ("auto", "msgspec"):
+        return loads(data)
+    try:
+        import msgspec
+    except ImportError:
+        return loads(data)
+
+    try:
+        return _chatgpt_export_decoder().decode(data)
+    except msgspec.ValidationError:
+        return loads(data)
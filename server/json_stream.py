@@ -0,0 +1,112 @@
+import json
+
+import json_backend
+
+# ----------------------------
+# INCREMENTAL JSON ARRAY READER
+# ----------------------------
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = ",]" + _WHITESPACE
+_CHUNK_SIZE = 1 << 20  # 1 MiB of text per read
+
+
+def _skip_whitespace(buf, pos):
+    while pos < len(buf) and buf[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def json_root_is_array(fp):
+    """Peek at a seekable file and report whether its JSON root is an array."""
+    start = fp.tell()
+    try:
+        while True:
+            chunk = fp.read(4096)
+            if not chunk:
+                return False
+            stripped = chunk.lstrip(_WHITESPACE)
+            if stripped:
+                return stripped[0] == "["
+    finally:
+        fp.seek(start)
+
+
+def iter_json_items(fp, chunk_size=_CHUNK_SIZE):
+    """Yield the items of a top-level JSON array one at a time.
+
+    Only the item currently being decoded is held in memory, so a
+    multi-hundred-MB export is walked with flat RSS. If the document root
+    is not an array, the whole root value is decoded and yielded once.
+    """
+    decoder = json.JSONDecoder()
+    buf = fp.read(chunk_size)
+    eof = not buf
+    pos = _skip_whitespace(buf, 0)
+
+    # Make sure we can see the first significant character
+    while pos >= len(buf) and not eof:
+        more = fp.read(chunk_size)
+        eof = not more
+        buf += more
+        pos = _skip_whitespace(buf, pos)
+
+    if pos >= len(buf):
+        return
+
+    if buf[pos] != "[":
+        # Not an array: nothing to stream, decode the root as a whole
+        yield json_backend.loads(buf[pos:] + fp.read())
+        return
+
+    pos += 1
+    expect_item = True
+    read_size = chunk_size
+
+    while True:
+        pos = _skip_whitespace(buf, pos)
+
+        if pos < len(buf):
+            ch = buf[pos]
+            if ch == "]":
+                return
+            if ch == "," and not expect_item:
+                pos += 1
+                expect_item = True
+                continue
+            if expect_item:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    end = None
+
+                # A scalar cut off at the buffer edge can still decode
+                # ("123." as 123, "1e" as 1), so only trust one once the
+                # delimiter after it has been read.
+                if end is not None and not eof and buf[pos] not in "{[\"":
+                    if end >= len(buf) or buf[end] not in _DELIMITERS:
+                        end = None
+                if end is not None and (end < len(buf) or eof):
+                    yield item
+                    pos = end
+                    expect_item = False
+                    read_size = chunk_size
+                    # Drop consumed text so the buffer never grows unbounded
+                    if pos > chunk_size:
+                        buf = buf[pos:]
+                        pos = 0
+                    continue
+            else:
+                raise json.JSONDecodeError("Expected ',' or ']'", buf, pos)
+
+        if eof:
+            raise json.JSONDecodeError("Unterminated array", buf, pos)
+
+        # Need more input; grow reads so one huge item is not re-scanned
+        # once per chunk.
+        more = fp.read(read_size)
+        eof = not more
+        buf = buf[pos:] + more
+        pos = 0
+        read_size *= 2
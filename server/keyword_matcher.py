@@ -0,0 +1,73 @@
+import itertools
+import re
+from collections import Counter
+
+# ----------------------------
+# SINGLE-PASS KEYWORD MATCHER
+# ----------------------------
+def _trie_pattern(keywords):
+    """Build a regex alternation shaped like a prefix trie of `keywords`."""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for token in re.split(r"(\s+)", keyword):
+            # Whitespace runs become one \s+ edge, other chars one edge each
+            for ch in ([" "] if token.isspace() else token):
+                node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        end = "" in node
+        branches = []
+        for ch in sorted(k for k in node if k):
+            edge = r"\s+" if ch == " " else re.escape(ch)
+            branches.append(edge + build(node[ch]))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            # Keyword may stop here; greedy ? still prefers the longer one
+            return (body if len(branches) > 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return build(trie) or "(?!)"
+
+class KeywordMatcher:
+    """Count whole-word occurrences of many keywords with one compiled regex.
+
+    All keywords are folded into a single trie-shaped regex, so shared
+    prefixes are tested once and the cost per character stays flat as the
+    vocabulary grows to thousands of terms. Greedy optional branches make
+    the longest keyword win ("machine learning" over "machine"). Texts are
+    fed one at a time, so callers never need to build a joined copy of the
+    corpus.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k.lower() for k in keywords if k))
+        # Lookarounds instead of \b so keywords like "c++" still match whole
+        self.pattern = rf"(?<!\w)(?:{_trie_pattern(self.keywords)})(?!\w)"
+        self._regex = re.compile(self.pattern, re.IGNORECASE)
+
+    def count(self, texts, counts=None, weights=None):
+        """Return a Counter of keyword -> occurrences across `texts`.
+
+        `weights`, parallel to `texts`, counts a text as that many copies.
+        """
+        counts = Counter() if counts is None else counts
+        findall = self._regex.findall
+        for text, weight in zip(texts, itertools.repeat(1) if weights is None else weights):
+            if not isinstance(text, str):
+                continue
+            for match in findall(text):
+                counts[" ".join(match.lower().split())] += weight
+        return counts
+
+    def rank(self, counts, keywords=None):
+        """Keywords with a non-zero count, most frequent first.
+
+        Ties keep the order of `keywords` (default: construction order).
+        """
+        order = self.keywords if keywords is None else keywords
+        present = [k for k in dict.fromkeys(order) if counts.get(k)]
+        return sorted(present, key=lambda k: -counts[k])
@@ -0,0 +1,65 @@
+import json
+import os
+
+from keyword_matcher import KeywordMatcher
+
+# ----------------------------
+# KEYWORD TAXONOMY
+# ----------------------------
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keyword_taxonomy.json")
+
+
+class KeywordTaxonomy:
+    """Domain -> keywords -> profession vocabulary shared by both parsers.
+
+    Domains are listed in priority order: the first domain whose profession
+    signals appear in the user's messages decides the inferred profession.
+    """
+
+    def __init__(self, domains):
+        self.domains = domains
+        self.interest_keywords = list(dict.fromkeys(
+            k.lower() for d in domains for k in d.get("keywords", [])))
+        self.tool_keywords = list(dict.fromkeys(
+            k.lower() for d in domains if d.get("tools") for k in d.get("keywords", [])))
+        self.professions = [(d["profession"], [k.lower() for k in d.get("signals", [])])
+                            for d in domains if d.get("profession")]
+        signal_keywords = [k for _, signals in self.professions for k in signals]
+        self.matcher = KeywordMatcher(self.interest_keywords + signal_keywords)
+
+    def count(self, texts, weights=None):
+        return self.matcher.count(texts, weights=weights)
+
+    def rank_interests(self, counts):
+        return self.matcher.rank(counts, self.interest_keywords)
+
+    def rank_tools(self, counts):
+        return self.matcher.rank(counts, self.tool_keywords)
+
+    def infer_profession(self, counts, default="Unknown"):
+        for label, signals in self.professions:
+            if any(counts.get(k) for k in signals):
+                return label
+        return default
+
+
+def load_taxonomy(path=None):
+    """Load a taxonomy file and build its keyword index.
+
+    Building the trie regex for the shipped vocabulary takes a few
+    milliseconds, so it is simply rebuilt once per process.
+    """
+    path = path or os.environ.get("KEYWORD_TAXONOMY", DEFAULT_TAXONOMY_PATH)
+    with open(path, "r", encoding="utf-8") as f:
+        return KeywordTaxonomy(json.load(f)["domains"])
+
+
+_taxonomy = None
+
+
+def get_taxonomy():
+    """Process-wide taxonomy, loaded on first use."""
+    global _taxonomy
+    if _taxonomy is None:
+        _taxonomy = load_taxonomy()
+    return _taxonomy
@@ -1,41 +1,35 @@
 import argparse
 import json
 import os
-import requests
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import json_backend
+import metrics
+import ollama_client
+from conversation_tree import iter_active_messages, message_text
+from export_source import is_zip_export, open_export
+from json_stream import iter_json_items, json_root_is_array
+from keyword_taxonomy import get_taxonomy
+from llm_cache import cache
+from message_dedup import dedup_conversations, weighted_texts
+from profile_llm import ProfileFlow, llm_profile
 
 # ----------------------------
 # FALLBACK PROFILE GENERATOR
 # ----------------------------
 def create_fallback_profile(user_messages, conversations):
     """Create a fallback profile using keyword-based analysis if LLaMA fails."""
-    all_text = " ".join(user_messages).lower() if user_messages else ""
-    conversation_titles = [c.get('title', '').lower() for c in conversations]
-    all_titles = " ".join(conversation_titles)
-
-    tech_keywords = ['javascript', 'python', 'react', 'node', 'api', 'database', 
-                     'ai', 'machine learning', 'coding', 'programming', 'html', 
-                     'css', 'sql', 'docker', 'git', 'github', 'typescript', 
-                     'vue', 'angular', 'express', 'cloud', 'aws', 'azure']
-    business_keywords = ['business', 'marketing', 'sales', 'startup', 'finance', 
-                         'analytics', 'strategy']
-    design_keywords = ['design', 'ui', 'ux', 'figma', 'creative', 'branding']
-
-    interests = []
-    for keyword in tech_keywords + business_keywords + design_keywords:
-        if keyword in all_text or keyword in all_titles:
-            interests.append(keyword.title())
-
-    interests = list(dict.fromkeys(interests))[:10]  # Deduplicate
-
-    profession = "Unknown"
-    if any(k in all_text for k in ['javascript', 'python', 'developer', 'coding']):
-        profession = "Software Developer"
-    elif any(k in all_text for k in ['design', 'ui', 'ux']):
-        profession = "Designer"
-    elif any(k in all_text for k in ['business', 'marketing']):
-        profession = "Business Professional"
+    taxonomy = get_taxonomy()
+    # Count collapsed duplicates by their weight rather than scanning every copy
+    texts, weights = weighted_texts(conversations) if conversations else (user_messages or [], None)
+    text_counts = taxonomy.count(texts, weights)
+    title_counts = taxonomy.count(c.get('title', '') for c in conversations)
+
+    # Rank interests by how often they come up, not by list order
+    interests = [k.title() for k in taxonomy.rank_interests(text_counts + title_counts)][:10]
+    profession = taxonomy.infer_profession(text_counts)
 
     return {
         "identityTraits": {
@@ -62,76 +56,105 @@ def create_fallback_profile(user_messages, conversations):
 # ----------------------------
 # PARSE SINGLE JSON FILE
 # ----------------------------
-def parse_json_file(file_path):
-    try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+def extract_conversation(conv):
+    """Extract a {title, messages} record from one ChatGPT export conversation."""
+    if not isinstance(conv, dict) or 'mapping' not in conv:
+        return None
+
+    conv_messages = []
+
+    # Active branch only, already in conversation order
+    for msg in iter_active_messages(conv):
+        text = message_text(msg)
+        if text:
+            conv_messages.append({
+                "role": msg.get('author', {}).get('role'),
+                "content": text,
+                "timestamp": msg.get("create_time")
+            })
+
+    if not conv_messages:
+        return None
 
-        print(f"Loaded data type: {type(data)}", file=sys.stderr)
-        if isinstance(data, list):
-            print(f"Data is list with {len(data)} items", file=sys.stderr)
+    return {
+        "title": conv.get("title", "Unknown"),
+        "messages": conv_messages
+    }
+
+def iter_conversations(file_path):
+    """Stream extracted conversations from an export without loading it whole."""
+    with open_export(file_path) as f:
+        if not json_root_is_array(f):
+            return
+        for conv in iter_json_items(f):
+            record = extract_conversation(conv)
+            if record:
+                yield record
+
+def parse_json_file(file_path, stream=False):
+    try:
+        # ZIP exports are always streamed straight out of the archive
+        stream = stream or is_zip_export(file_path)
 
         conversations = []
         user_messages = []
 
-        if isinstance(data, list):
-            for conv in data:
-                if 'mapping' in conv:
-                    mapping = conv['mapping']
-                    conv_messages = []
-
-                    for node in mapping.values():
-                        msg = node.get('message')
-                        if msg and msg.get('content'):
-                            role = msg.get('author', {}).get('role')
-                            parts = msg.get('content', {}).get('parts', [])
-                            if parts and parts[0]:
-                                conv_messages.append({
-                                    "role": role,
-                                    "content": parts[0],
-                                    "timestamp": msg.get("create_time")
-                                })
-                    
-                    conv_messages.sort(key=lambda x: x.get("timestamp") or 0)
-
-                    if conv_messages:
-                        conversations.append({
-                            "title": conv.get("title", "Unknown"),
-                            "messages": conv_messages
-                        })
-                        # Extract just the content strings for user messages
-                        user_content = [m["content"] for m in conv_messages if m["role"] == "user"]
-                        user_messages.extend(user_content)
+        with metrics.span("load", bytes=os.path.getsize(file_path), stream=stream) as load:
+            if stream:
+                # Decoding happens lazily, so streamed time shows up under extract
+                records = iter_conversations(file_path)
+            else:
+                with open_export(file_path) as f:
+                    # Typed decode of just the fields we read, when msgspec is around
+                    data = json_backend.load_chatgpt_export(f)
+                load["items"] = len(data) if isinstance(data, list) else 1
+                records = (extract_conversation(conv) for conv in data) if isinstance(data, list) else []
+
+        with metrics.span("extract", stream=stream) as extract:
+            message_count = 0
+            for record in records:
+                if record:
+                    conversations.append(record)
+                    message_count += len(record["messages"])
+                    # Extract just the content strings for user messages
+                    user_content = [m["content"] for m in record["messages"] if m["role"] == "user"]
+                    user_messages.extend(user_content)
+            extract.update(conversations=len(conversations), messages=message_count,
+                           user_messages=len(user_messages))
+
+        with metrics.span("dedup") as dedup:
+            conversations, stats = dedup_conversations(conversations)
+            user_messages = [m["content"] for c in conversations for m in c["messages"] if m["role"] == "user"]
+            dedup.update(stats)
 
         print(f"Extracted {len(conversations)} conversations, {len(user_messages)} user messages", file=sys.stderr)
-        print(f"First user message type: {type(user_messages[0]) if user_messages else 'None'}", file=sys.stderr)
-        
         return conversations, user_messages
 
     except Exception as e:
         print(f"Error parsing {file_path}: {e}", file=sys.stderr)
         return [], []
 
+def parse_json_file_with_metrics(file_path, stream=False):
+    """parse_json_file for a worker process; also returns the spans it recorded."""
+    with metrics.collecting() as collector:
+        conversations, user_messages = parse_json_file(file_path, stream)
+    return conversations, user_messages, collector.spans
+
 # ----------------------------
 # LLaMA ANALYSIS
 # ----------------------------
-def analyze_with_llama(user_messages, conversations):
-    print(f"analyze_with_llama called with {len(user_messages)} messages", file=sys.stderr)
-    print(f"First few message types: {[type(m) for m in user_messages[:5]]}", file=sys.stderr)
-    print(f"First few messages: {user_messages[:3]}", file=sys.stderr)
-    
-    # Filter out any non-string items that might have snuck in
-    string_messages = [str(m) for m in user_messages if m and isinstance(m, (str, int, float))]
-    user_text_sample = "\n".join(string_messages[:30])
-    conversation_titles = [c.get("title", "") for c in conversations[:20]]
-
-    prompt = f"""
+PROFILE_MODEL = "llama3.2:7b"
+PROFILE_OPTIONS = {"temperature": 0.3}
+
+def profile_prompt(user_text_sample, conversation_titles):
+    """Prompt asking LLaMA for a profile of one block of user text."""
+    return f"""
 You are a JSON-only extractor.
 Analyze this ChatGPT conversation data to infer a user profile.
 Respond ONLY with valid JSON. No explanations, no text outside the JSON.
 
 USER MESSAGES:
-{user_text_sample[:6000]}
+{user_text_sample}
 
 CONVERSATION TITLES:
 {json.dumps(conversation_titles, indent=2)}
@@ -160,58 +183,79 @@ Return JSON ONLY in this format:
 }}
 """
 
-    try:
-        response = requests.post("http://localhost:11434/api/generate", json={
-            "model": "llama3.2:7b",
-            "prompt": prompt,
-            "stream": False,
-            "options": {"temperature": 0.3}
-        })
-
-        if response.status_code == 200:
-            result = response.json().get("response", "")
-            start = result.find("{")
-            end = result.rfind("}") + 1
-
-            if start >= 0 and end > start:
-                try:
-                    return json.loads(result[start:end])
-                except json.JSONDecodeError:
-                    print("Invalid JSON from LLaMA, falling back", file=sys.stderr)
-        else:
-            print(f"Ollama failed: {response.status_code}", file=sys.stderr)
+# 1500 tokens is the same ~6000 characters the prompt always allowed
+PROFILE_FLOW = ProfileFlow(PROFILE_MODEL, PROFILE_OPTIONS, profile_prompt, token_budget=1500)
 
-    except Exception as e:
-        print(f"Error calling Ollama: {e}", file=sys.stderr)
-
-    return create_fallback_profile(user_messages, conversations)
+def analyze_with_llama(user_messages, conversations, timeout=ollama_client.DEFAULT_TIMEOUT,
+                       map_reduce=False, concurrency=None):
+    # Map-reduce makes one LLaMA call per context-sized window and merges them by weight;
+    # otherwise one call over a sample of the whole export, not the oldest 30 messages
+    profile = llm_profile(PROFILE_FLOW, user_messages, conversations, map_reduce=map_reduce,
+                          concurrency=concurrency, timeout=timeout)
+    if profile is not None:
+        return profile
+    with metrics.span("fallback", user_messages=len(user_messages)):
+        return create_fallback_profile(user_messages, conversations)
 
 # ----------------------------
 # AGGREGATE MULTIPLE FILES
 # ----------------------------
-def aggregate_profiles(folder_path):
-    all_profiles = []
-    for file in os.listdir(folder_path):
-        if file.endswith(".json"):
+def aggregate_profiles(folder_path, stream=False, parse_workers=None, llm_concurrency=2, map_reduce=False):
+    """Parse every export in a process pool and profile them on a bounded thread pool.
+
+    Ollama calls start as soon as each file is parsed; profiles are returned
+    in sorted file-name order regardless of completion order.
+    """
+    files = sorted(f for f in os.listdir(folder_path) if f.endswith((".json", ".zip")))
+    profiles = [None] * len(files)
+    # Map-reduce windows fan out further, so bound the requests themselves
+    ollama_client.client.set_max_in_flight(llm_concurrency)
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool:
+        parse_futures = {}
+        for index, file in enumerate(files):
             print(f"Processing {file}...", file=sys.stderr)
-            convs, msgs = parse_json_file(os.path.join(folder_path, file))
+            future = parse_pool.submit(parse_json_file_with_metrics, os.path.join(folder_path, file), stream)
+            parse_futures[future] = index
+
+        llm_futures = {}
+        for future in as_completed(parse_futures):
+            convs, msgs, spans = future.result()
+            metrics.current().extend(spans)
             if msgs:
-                profile = analyze_with_llama(msgs, convs)
-                all_profiles.append(profile)
+                llm_future = llm_pool.submit(analyze_with_llama, msgs, convs, map_reduce=map_reduce)
+                llm_futures[llm_future] = parse_futures[future]
+
+        for future in as_completed(llm_futures):
+            profiles[llm_futures[future]] = future.result()
 
-    return all_profiles
+    return [profile for profile in profiles if profile is not None]
 
 # ----------------------------
 # MAIN ENTRY POINT
 # ----------------------------
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Parse ChatGPT conversation exports into user profiles.")
-    parser.add_argument("--folder", required=True, help="Path to folder with JSON conversation files")
+    parser.add_argument("--folder", required=True, help="Path to folder with JSON or ZIP conversation exports")
     parser.add_argument("--output", default="user_profiles.json", help="Output file name")
+    parser.add_argument("--stream", action="store_true", help="Stream exports one conversation at a time to keep memory flat")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Processes used for JSON parsing (default: CPU count)")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="Maximum Ollama requests in flight")
+    parser.add_argument("--map-reduce", action="store_true", help="Profile every conversation in context-sized chunks and merge the results")
+    parser.add_argument("--metrics-file", help="Append the JSON metrics record to this file instead of stderr")
+    parser.add_argument("--profile", help="Write cProfile stats for the run to this path")
+    parser.add_argument("--trace-memory", action="store_true", help="Record tracemalloc peak and top allocations in the metrics")
     args = parser.parse_args()
 
-    profiles = aggregate_profiles(args.folder)
+    with metrics.profiling(args.profile, args.trace_memory):
+        profiles = aggregate_profiles(args.folder, stream=args.stream,
+                                      parse_workers=args.parse_workers,
+                                      llm_concurrency=args.llm_concurrency,
+                                      map_reduce=args.map_reduce)
     with open(args.output, "w") as out:
-        json.dump(profiles, out, indent=2)
+        json_backend.dump(profiles, out, indent=2)
 
+    metrics.emit(metrics.current().to_record(command="llama_parser", profiles=len(profiles),
+                                             cache=cache.stats()), args.metrics_file)
     print(f"✅ Extracted {len(profiles)} profiles and saved to {args.output}")
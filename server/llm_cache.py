@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+# ----------------------------
+# ON-DISK LLM RESPONSE CACHE
+# ----------------------------
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "llmbridge", "llm")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class LLMCache:
+    """Content-addressed cache of Ollama responses with size-bounded LRU eviction.
+
+    Entries are keyed by a hash of (model, prompt, options) and stored one
+    file per key. A hit bumps the file's mtime, so eviction removes the
+    least recently used entries once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @classmethod
+    def from_env(cls):
+        """Cache configured from the environment; off unless LLM_CACHE_DIR or LLM_CACHE_MAX_BYTES is set.
+
+        Responses hold LLM-extracted profiles (names, locations, projects),
+        so nothing is written to disk unless the user asks for it.
+        """
+        directory = os.environ.get("LLM_CACHE_DIR")
+        max_bytes = os.environ.get("LLM_CACHE_MAX_BYTES")
+        if directory is None and max_bytes is None:
+            return cls(DEFAULT_CACHE_DIR, 0)
+        return cls(directory or DEFAULT_CACHE_DIR, int(max_bytes) if max_bytes else DEFAULT_MAX_BYTES)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(model, prompt, options=None):
+        payload = json.dumps({"model": model, "prompt": prompt, "options": options or {}},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, model, prompt, options=None):
+        """Return the cached response text, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        path = self._path(self.key(model, prompt, options))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = f.read()
+            os.utime(path)  # Mark as most recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return response
+
+    def put(self, model, prompt, response, options=None):
+        if not self.enabled:
+            return
+
+        path = self._path(self.key(model, prompt, options))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = response.encode("utf-8")
+            # Write atomically so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"LLM cache write failed: {e}", file=sys.stderr)
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cache entry."""
+        if not os.path.isdir(self.directory):
+            return
+        for shard in os.scandir(self.directory):
+            # Shards are two-hex-char directories; skip nested caches
+            if not shard.is_dir() or len(shard.name) != 2:
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        # Trim to 90% of the budget so we don't evict on every single write
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+cache = LLMCache.from_env()
+
+# LLM structure analyses keyed by schema fingerprint (see schema_fingerprint.py)
+structure_cache = LLMCache(os.path.join(cache.directory, "structures"),
+                         16 * 1024 * 1024 if cache.enabled else 0)
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import re
+from collections import Counter, defaultdict
+
+# ----------------------------
+# MESSAGE DEDUPLICATION
+# ----------------------------
+BANDS = 4             # 64-bit SimHash split into four 16-bit LSH bands
+# Hamming bits for a near duplicate. Pairs within BANDS - 1 always share a
+# band; up to 7 most do (about 2/3 of one-word edits to a short prompt)
+MAX_DISTANCE = 7
+MIN_NEAR_TOKENS = 8   # shorter texts are too small for SimHash; exact only
+MAX_FEATURES = 4096
+# SimHash costs far more than parsing, so near-duplicate detection is opt-in
+NEAR_DUPLICATES = os.environ.get("DEDUP_NEAR_DUPLICATES", "").lower() in ("1", "true", "yes")
+
+_WORD = re.compile(r"\w+")
+
+# Per-bit SimHash counters are packed into one big int, 16 bits per bit
+# position, so summing a text's features is one C-level int add each and
+# the majority vote is a single add-and-mask (see simhash)
+_LANE_BITS = 16
+_ONES = sum(1 << (bit * _LANE_BITS) for bit in range(64))
+_SIGN_BITS = _ONES << (_LANE_BITS - 1)
+_BYTE_SPREAD = [sum(((value >> bit) & 1) << (bit * _LANE_BITS) for bit in range(8)) for value in range(256)]
+_BIT_CHARS = bytes.maketrans(b"\x00\x80", b"01")
+_feature_cache = {}
+
+
+def _spread(feature):
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    spread = 0
+    for i in range(8):
+        spread |= _BYTE_SPREAD[(h >> (8 * i)) & 0xFF] << (8 * i * _LANE_BITS)
+    return spread
+
+
+def simhash(tokens):
+    """64-bit SimHash of a token list, using words and word bigrams as features."""
+    global _feature_cache
+    features = tokens[:MAX_FEATURES // 2] + [a + " " + b for a, b in zip(tokens, tokens[1:MAX_FEATURES // 2])]
+    if len(_feature_cache) > 200_000:
+        # Rebind rather than clear(): other threads keep the dict they hold
+        _feature_cache = {}
+    cache = _feature_cache
+    for feature in set(features).difference(cache):
+        cache[feature] = _spread(feature)
+    total = sum(map(cache.__getitem__, features))
+
+    # Bias every lane so its top bit is set exactly when the bit won the
+    # majority vote, then read the 64 top bits out as a binary string
+    bias = (1 << (_LANE_BITS - 1)) - 1 - len(features) // 2
+    high_bytes = ((total + bias * _ONES) & _SIGN_BITS).to_bytes(64 * _LANE_BITS // 8, "little")[1::2]
+    return int(high_bytes.translate(_BIT_CHARS)[::-1], 2)
+
+
+class Deduplicator:
+    """Map each text to the first earlier text it repeats.
+
+    Exact repeats are found with a dict keyed by the text itself, which
+    reuses the string's cached hash. With `near`, near repeats (edited
+    regenerations, boilerplate with a changed name) are found by SimHash:
+    candidates come from 16-bit LSH bands and are confirmed by Hamming
+    distance, so lookups stay close to O(1).
+    """
+
+    def __init__(self, near=None, max_distance=MAX_DISTANCE, min_tokens=MIN_NEAR_TOKENS):
+        self.near = NEAR_DUPLICATES if near is None else near
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self._exact = {}
+        self._fingerprints = []
+        self._bands = [defaultdict(list) for _ in range(BANDS)]
+
+    def find_or_add(self, text):
+        """Return (representative_id, kind), kind being "new", "exact" or "near"."""
+        rep = self._exact.get(text)
+        if rep is not None:
+            return rep, "exact"
+
+        fingerprint = None
+        tokens = _WORD.findall(text.lower()) if self.near else ()
+        if len(tokens) >= self.min_tokens:
+            fingerprint = simhash(tokens)
+            for i, band in enumerate(self._bands):
+                for candidate in band.get((fingerprint >> (16 * i)) & 0xFFFF, ()):
+                    if bin(fingerprint ^ self._fingerprints[candidate]).count("1") <= self.max_distance:
+                        self._exact[text] = candidate
+                        return candidate, "near"
+
+        rep = len(self._fingerprints)
+        self._exact[text] = rep
+        self._fingerprints.append(fingerprint)
+        if fingerprint is not None:
+            for i, band in enumerate(self._bands):
+                band[(fingerprint >> (16 * i)) & 0xFFFF].append(rep)
+        return rep, "new"
+
+
+def _conversation_key(conv, role):
+    # The strings themselves, not a digest: their hashes are cached and
+    # reused by the message lookup. Replies are left out, so a re-run chat
+    # with the same prompts counts as a copy
+    return (str(conv.get("title", "")),
+            tuple(m.get("content") for m in conv.get("messages", []) if m.get("role") == role))
+
+
+def _variants(m):
+    return m.get("variants") or {}
+
+
+def dedup_conversations(conversations, role="user", near=None):
+    """Collapse repeated conversations and repeated `role` messages.
+
+    The first occurrence of a message is kept, in place, with a "weight"
+    equal to the number of copies it stands for; weights already present
+    are added, so deduplicating twice is harmless. The edited text of a
+    near duplicate is also kept, in the message's "variants" as text ->
+    copies, so keyword counts over weighted_texts match a count over every
+    original message. A conversation with the same title and `role`
+    messages as an earlier one is dropped and its messages' weight goes
+    to the originals. Other roles are left alone. Near duplicates are only
+    detected with `near` (default: DEDUP_NEAR_DUPLICATES). Returns
+    (conversations, stats).
+    """
+    dedup = Deduplicator(near)
+    representatives = []  # representative id -> kept message dict
+    seen_conversations = set()
+    result = []
+    stats = Counter(messages_in=0, messages_out=0, exact=0, near=0, conversations=0)
+
+    for conv in conversations:
+        key = _conversation_key(conv, role)
+        duplicate = key in seen_conversations
+        seen_conversations.add(key)
+        stats["conversations"] += duplicate
+
+        messages = []
+        for m in conv.get("messages", []):
+            if m.get("role") != role or not isinstance(m.get("content"), str):
+                messages.append(m)
+                continue
+            stats["messages_in"] += 1
+            rep, kind = dedup.find_or_add(m["content"])
+            if kind == "new" and not duplicate:
+                m = dict(m)
+                if "variants" in m:
+                    m["variants"] = dict(m["variants"])
+                representatives.append(m)
+                messages.append(m)
+                stats["messages_out"] += 1
+            else:
+                original = representatives[rep]
+                weight = m.get("weight", 1)
+                original["weight"] = original.get("weight", 1) + weight
+                if m["content"] != original["content"] or "variants" in m:
+                    variants = original.setdefault("variants", {})
+                    if m["content"] != original["content"]:
+                        own = weight - sum(_variants(m).values())
+                        variants[m["content"]] = variants.get(m["content"], 0) + own
+                    for text, copies in _variants(m).items():
+                        variants[text] = variants.get(text, 0) + copies
+                stats[kind] += 1
+
+        if messages and not duplicate:
+            result.append(dict(conv, messages=messages))
+
+    return result, dict(stats)
+
+
+def dedup_groups(conversations, near=None):
+    """dedup_conversations over (title, texts) pairs, e.g. read from a ConversationStore.
+
+    Returns (titles, groups, stats): the titles of the kept conversations
+    and, per kept conversation, (text, copies) pairs of its distinct
+    non-blank messages. Conversations and messages are collapsed and
+    weighted exactly as dedup_conversations does, so sampling these groups
+    gives the same prompt as sampling its output.
+    """
+    dedup = Deduplicator(near)
+    weights = []  # representative id -> copies
+    seen_conversations = set()
+    titles, kept = [], []
+    stats = Counter(messages_in=0, messages_out=0, exact=0, near=0, conversations=0)
+
+    for title, texts in conversations:
+        key = (title, tuple(texts))
+        duplicate = key in seen_conversations
+        seen_conversations.add(key)
+        stats["conversations"] += duplicate
+
+        group = []
+        for text in texts:
+            stats["messages_in"] += 1
+            rep, kind = dedup.find_or_add(text)
+            if kind == "new" and not duplicate:
+                weights.append(1)
+                group.append((text, rep))
+                stats["messages_out"] += 1
+            else:
+                weights[rep] += 1
+                stats[kind] += 1
+
+        if not duplicate:
+            titles.append(title)
+            kept.append(group)
+
+    groups = [[(text, weights[rep]) for text, rep in group if text.strip()] for group in kept]
+    return titles, groups, dict(stats)
+
+
+def weighted_texts(conversations, role="user"):
+    """(texts, weights) of `role` messages and their variants, for keyword counting."""
+    texts = []
+    weights = []
+    for conv in conversations:
+        for m in conv.get("messages", []):
+            if m.get("role") == role and isinstance(m.get("content"), str):
+                variants = _variants(m)
+                texts.append(m["content"])
+                weights.append(m.get("weight", 1) - sum(variants.values()))
+                texts.extend(variants)
+                weights.extend(variants.values())
+    return texts, weights
@@ -0,0 +1,128 @@
+import hashlib
+import heapq
+import math
+import random
+
+# ----------------------------
+# REPRESENTATIVE MESSAGE SAMPLING
+# ----------------------------
+CHARS_PER_TOKEN = 4  # Rough average for English text with LLaMA tokenizers
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _digest(text):
+    return hashlib.blake2b(_normalize(text).encode("utf-8"), digest_size=8).digest()
+
+
+def message_groups(conversations, role="user"):
+    """Per conversation, the (text, weight) pairs of its non-blank `role` messages."""
+    for conv in conversations:
+        yield [(m["content"], m.get("weight", 1)) for m in conv.get("messages", [])
+               if m.get("role") == role and isinstance(m.get("content"), str) and m["content"].strip()]
+
+
+def reservoir_sample(conversations, capacity=400, role="user", seed=0):
+    """Weighted reservoir sample of distinct messages in one pass.
+
+    Every conversation gets the same total weight, split across its
+    messages, so a handful of very long chats cannot crowd out the rest of
+    a multi-year export. Exact repeats (after case/whitespace folding) are
+    counted once, and a message's "weight" (copies collapsed by
+    message_dedup) scales its share, so a prompt asked many times is
+    likelier to be kept. Returns (order, text) pairs where `order` is the
+    message's position in the stream. The seed is fixed by default so the
+    same export yields the same sample, and therefore the same prompt and
+    LLM cache key, on every run.
+    """
+    return reservoir_sample_groups(message_groups(conversations, role), capacity, seed)
+
+
+def reservoir_sample_groups(groups, capacity=400, seed=0):
+    """reservoir_sample over per-conversation lists of (text, weight) pairs."""
+    rng = random.Random(seed)
+    seen = set()
+    heap = []  # (key, order, text), min-heap on key
+    order = 0
+
+    for messages in groups:
+        if not messages:
+            continue
+        share = 1.0 / len(messages)
+
+        for text, copies in messages:
+            weight = share * copies
+            order += 1
+            digest = _digest(text)
+            if digest in seen:
+                continue
+            seen.add(digest)
+
+            # Efraimidis-Spirakis: key = u^(1/w), keep the largest keys
+            key = math.log(rng.random() or 1e-12) / weight
+            if len(heap) < capacity:
+                heapq.heappush(heap, (key, order, text))
+            elif key > heap[0][0]:
+                heapq.heapreplace(heap, (key, order, text))
+
+    # Highest priority first
+    return [(o, t) for _, o, t in sorted(heap, reverse=True)]
+
+
+def pack_messages(candidates, token_budget, max_message_tokens=200, separator="\n"):
+    """Greedily fill `token_budget` with candidates, in priority order.
+
+    Long messages are clipped to `max_message_tokens` so one wall of pasted
+    code can't eat the budget. Items that don't fit are skipped rather than
+    ending the packing, so smaller later items can still fill the gap. The
+    chosen messages are returned in their original stream order.
+    """
+    chosen = []
+    used = 0
+    sep_tokens = estimate_tokens(separator)
+    max_chars = max_message_tokens * CHARS_PER_TOKEN
+
+    for order, text in candidates:
+        text = text.strip()
+        if len(text) > max_chars:
+            text = text[:max_chars].rstrip() + "…"
+        cost = estimate_tokens(text) + (sep_tokens if chosen else 0)
+        if used + cost > token_budget:
+            continue
+        chosen.append((order, text))
+        used += cost
+        if token_budget - used < sep_tokens + 1:
+            break
+
+    chosen.sort()
+    return [text for _, text in chosen]
+
+
+def sample_messages(conversations, token_budget, max_message_tokens=200, role="user", seed=0):
+    """Representative, deduplicated messages that fit within `token_budget`."""
+    return sample_groups(message_groups(conversations, role), token_budget, max_message_tokens, seed)
+
+
+def sample_groups(groups, token_budget, max_message_tokens=200, seed=0):
+    """sample_messages over per-conversation (text, weight) lists, e.g. from a ConversationStore."""
+    candidates = reservoir_sample_groups(groups, seed=seed)
+    return pack_messages(candidates, token_budget, max_message_tokens)
+
+
+def sample_titles(conversations, limit=20):
+    """Conversation titles spread evenly across the export, not just the first ones."""
+    return spread_titles([c.get("title", "") for c in conversations], limit)
+
+
+def spread_titles(titles, limit=20):
+    """At most `limit` titles taken at even steps through `titles`."""
+    if len(titles) <= limit:
+        return titles
+    step = len(titles) / limit
+    return [titles[int(i * step)] for i in range(limit)]
@@ -0,0 +1,150 @@
+import contextlib
+import contextvars
+import cProfile
+import sys
+import threading
+import time
+import tracemalloc
+
+import json_backend
+
+# ----------------------------
+# PIPELINE METRICS
+# ----------------------------
+_collector = contextvars.ContextVar("metrics_collector", default=None)
+_open_span = contextvars.ContextVar("metrics_open_span", default=None)
+
+
+class MetricsCollector:
+    """Spans recorded for one run (or one worker job) of the parser pipeline.
+
+    Each span is a flat dict: its stage name, wall time in ms, and whatever
+    counters the stage attached (bytes, messages, tokens, cache hits...).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.spans = []
+        self.extra = {}
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def extend(self, records):
+        with self._lock:
+            self.spans.extend(records)
+
+    def stages(self):
+        """Per-stage totals: span count, wall time, and summed numeric counters."""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            stage = totals.setdefault(record["stage"], {"count": 0})
+            stage["count"] += 1
+            for key, value in record.items():
+                if isinstance(value, bool):
+                    if value:
+                        stage[key] = stage.get(key, 0) + 1
+                elif isinstance(value, (int, float)):
+                    stage[key] = round(stage.get(key, 0) + value, 3)
+        return totals
+
+    def to_record(self, **fields):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "type": "parser_metrics",
+            "started": self.started,
+            "wall_ms": round((time.time() - self.started) * 1000, 3),
+            **self.extra,
+            **fields,
+            "stages": self.stages(),
+            "spans": spans,
+        }
+
+
+# Process-wide default; worker jobs and child processes install their own
+metrics = MetricsCollector()
+
+
+def current():
+    return _collector.get() or metrics
+
+
+@contextlib.contextmanager
+def collecting():
+    """Route spans recorded in this context to a fresh collector."""
+    collector = MetricsCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage, **fields):
+    """Time a pipeline stage; the yielded dict takes extra counters."""
+    record = {"stage": stage, **fields}
+    token = _open_span.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["wall_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        _open_span.reset(token)
+        current().add(record)
+
+
+def annotate(**fields):
+    """Attach counters to the innermost open span, if there is one."""
+    record = _open_span.get()
+    if record is not None:
+        record.update(fields)
+
+
+def emit(record, path=None):
+    """Write one metrics record as a JSON line to `path`, or stderr."""
+    line = json_backend.dumps(record)
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    else:
+        print(line, file=sys.stderr)
+
+
+@contextlib.contextmanager
+def profiling(profile_path=None, trace_memory=False, collector=None):
+    """Optionally run the block under cProfile and/or tracemalloc.
+
+    cProfile stats are dumped to `profile_path` (load with pstats or
+    snakeviz); tracemalloc peak and top allocation sites are added to the
+    collector's metrics record.
+    """
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if trace_memory:
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            tracemalloc.stop()
+            (collector or current()).extra["memory"] = {
+                "current_bytes": current_bytes,
+                "peak_bytes": peak_bytes,
+                "top": [{"where": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                        for stat in top],
+            }
@@ -0,0 +1,619 @@
+import asyncio
+import collections
+import itertools
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import json_backend
+import metrics
+
+# ----------------------------
+# STREAMING OLLAMA CLIENT
+# ----------------------------
+DEFAULT_ENDPOINT = "http://localhost:11434"
+DEFAULT_TIMEOUT = 120  # seconds of generation per call, retries included
+
+
+class OllamaTimeout(Exception):
+    pass
+
+
+class ServerError(Exception):
+    pass
+
+
+class JsonObjectScanner:
+    """Track brace balance across streamed text to spot the end of a JSON object.
+
+    Braces inside string literals (including escaped quotes) are ignored.
+    Once the first top-level object closes, `text` holds exactly that object.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.complete = False
+        self._parts = []
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def feed(self, chunk):
+        """Consume a chunk of text; return True once a full object has been seen."""
+        if self.complete:
+            return True
+
+        start = 0
+        for i, ch in enumerate(chunk):
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self.depth = 1
+                    start = i
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._parts.append(chunk[start:i + 1])
+                    self.complete = True
+                    return True
+
+        if self.started:
+            self._parts.append(chunk[start:])
+        return False
+
+
+def parse_json_object(text):
+    """The outermost {...} in a model response as a dict, or None."""
+    start = text.find("{")
+    end = text.rfind("}") + 1
+    if start < 0 or end <= start:
+        return None
+    try:
+        return json_backend.loads(text[start:end])
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """Stop calling an endpoint after repeated failures, then probe it again.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds. The first call after that is
+    let through as a probe; success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let one probe through, re-arm until it reports back
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RequestLimiter:
+    """Cap on Ollama requests in flight, shared by threads and event loops.
+
+    Every generate call, sync or async, takes a slot for each attempt, so
+    map-reduce windows, parser thread pools and concurrent uploads together
+    never have more than `limit` generations running. Slots are handed to
+    waiters in arrival order.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._waiters = collections.deque()  # wake callbacks; True once the slot is taken
+        self._lock = threading.Lock()
+
+    def set_limit(self, limit):
+        with self._lock:
+            self.limit = limit
+            self._wake()
+
+    def _wake(self):
+        while self._waiters and self.active < self.limit:
+            if self._waiters.popleft()():
+                self.active += 1
+
+    def _try_acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        return False
+
+    def acquire(self, timeout=None):
+        """Block until a slot is free; False if `timeout` seconds pass first."""
+        granted = threading.Event()
+
+        def waker():
+            granted.set()
+            return True
+
+        with self._lock:
+            if self._try_acquire():
+                return True
+            self._waiters.append(waker)
+        if granted.wait(timeout):
+            return True
+        with self._lock:
+            if granted.is_set():
+                return True
+            self._waiters.remove(waker)
+            return False
+
+    async def acquire_async(self, timeout=None):
+        """acquire() for coroutines; waits without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            if future.done():
+                # The waiter gave up after the slot was handed over
+                self.release()
+            else:
+                future.set_result(True)
+
+        def waker():
+            try:
+                loop.call_soon_threadsafe(grant)
+                return True
+            except RuntimeError:
+                return False  # loop closed
+
+        with self._lock:
+            if self._try_acquire():
+                return True
+            self._waiters.append(waker)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waker in self._waiters:
+                    self._waiters.remove(waker)
+            return False
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+            self._wake()
+
+
+class OllamaUnavailable(Exception):
+    """Every configured endpoint is failing; callers should fall back immediately."""
+
+
+class OllamaClient:
+    """Pooled, retrying Ollama client shared by every parser call site.
+
+    Requests are spread round-robin across `endpoints`, each guarded by its
+    own circuit breaker. Connection errors, timeouts and 5xx responses are
+    retried with exponential backoff on the next healthy endpoint. At most
+    `max_in_flight` generations run at once (default: two per endpoint).
+    """
+
+    def __init__(self, endpoints=(DEFAULT_ENDPOINT,), connect_timeout=3.05, read_timeout=60,
+                 retries=2, backoff=0.5, failure_threshold=3, reset_timeout=30, pool_size=10,
+                 max_in_flight=None):
+        self.endpoints = [e.rstrip("/") for e in endpoints]
+        self.in_flight = RequestLimiter(max_in_flight or 2 * len(self.endpoints))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breakers = {e: CircuitBreaker(failure_threshold, reset_timeout) for e in self.endpoints}
+        self._next = itertools.count()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls):
+        endpoints = [e.strip() for e in os.environ.get("OLLAMA_ENDPOINTS", DEFAULT_ENDPOINT).split(",") if e.strip()]
+        return cls(
+            endpoints,
+            connect_timeout=float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 3.05)),
+            read_timeout=float(os.environ.get("OLLAMA_READ_TIMEOUT", 60)),
+            retries=int(os.environ.get("OLLAMA_RETRIES", 2)),
+            max_in_flight=int(os.environ.get("OLLAMA_MAX_IN_FLIGHT", 0)) or None,
+        )
+
+    @property
+    def max_in_flight(self):
+        return self.in_flight.limit
+
+    def set_max_in_flight(self, limit):
+        """Change the cap on concurrent generations (e.g. from a CLI flag)."""
+        self.in_flight.set_limit(limit)
+
+    @property
+    def healthy(self):
+        return any(not breaker.is_open for breaker in self.breakers.values())
+
+    def _pick_endpoint(self):
+        start = next(self._next)
+        for offset in range(len(self.endpoints)):
+            endpoint = self.endpoints[(start + offset) % len(self.endpoints)]
+            if self.breakers[endpoint].allow():
+                return endpoint
+        return None
+
+    def generate(self, model, prompt, options=None, timeout=DEFAULT_TIMEOUT):
+        """Stream /api/generate and return the generated text.
+
+        Generation is cut off as soon as the first complete JSON object has
+        arrived, so a model that keeps talking after the closing brace does
+        not hold the request open. `timeout` bounds the time spent
+        generating, retries and backoff included; time queued for an
+        in-flight slot does not count, so a burst of calls all get their
+        full budget. Returns the JSON object text when one was found,
+        otherwise the full response text.
+        """
+        remaining = timeout  # generation time left; queueing for a slot is free
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1))
+                if timeout:
+                    delay = min(delay, max(0, remaining))
+                    remaining -= delay
+                time.sleep(delay)
+
+            endpoint = self._pick_endpoint()
+            if endpoint is None:
+                raise OllamaUnavailable("All Ollama endpoints are failing, circuit open")
+
+            self.in_flight.acquire()
+            started = time.monotonic()
+            deadline = started + remaining if timeout else None
+            read_timeout = self.read_timeout
+            if deadline:
+                if remaining <= 0:
+                    self.in_flight.release()
+                    break
+                read_timeout = min(read_timeout, remaining)
+
+            breaker = self.breakers[endpoint]
+            try:
+                text = self._stream(endpoint, model, prompt, options, (self.connect_timeout, read_timeout), deadline, timeout)
+            except requests.HTTPError:
+                # 4xx (bad request, missing model): not an endpoint health issue
+                breaker.record_success()
+                raise
+            except (requests.RequestException, ServerError) as e:
+                # Includes drops mid-stream (ChunkedEncodingError), not just connect failures
+                breaker.record_failure()
+                last_error = e
+                print(f"Ollama attempt {attempt + 1} on {endpoint} failed: {e}", file=sys.stderr)
+                continue
+            except OllamaTimeout:
+                # A generation that blows the deadline counts against the endpoint,
+                # but there is no time left to retry it
+                breaker.record_failure()
+                raise
+            except Exception:
+                # An error reported for this request: the endpoint itself is fine
+                breaker.record_success()
+                raise
+            finally:
+                self.in_flight.release()
+                if timeout:
+                    remaining -= time.monotonic() - started
+
+            breaker.record_success()
+            metrics.annotate(attempts=attempt + 1, endpoint=endpoint)
+            return text
+
+        if last_error is None:
+            raise OllamaTimeout(f"Ollama generation exceeded {timeout}s")
+        raise last_error
+
+    def _stream(self, endpoint, model, prompt, options, request_timeout, deadline, timeout):
+        scanner = JsonObjectScanner()
+        pieces = []
+        first_token_at = None
+        done = False
+        started = time.perf_counter()
+
+        response = self.session.post(endpoint + "/api/generate", json={
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options or {}
+        }, stream=True, timeout=request_timeout)
+
+        try:
+            if response.status_code >= 500:
+                raise ServerError(f"Ollama returned {response.status_code}")
+            response.raise_for_status()
+
+            for line in response.iter_lines():
+                if deadline and time.monotonic() > deadline:
+                    raise OllamaTimeout(f"Ollama generation exceeded {timeout}s")
+                if not line:
+                    continue
+
+                chunk = json_backend.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+
+                piece = chunk.get("response", "")
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                pieces.append(piece)
+                complete = scanner.feed(piece)
+                done = bool(chunk.get("done"))
+                if done:
+                    # Only the final chunk carries Ollama's own token accounting
+                    metrics.annotate(eval_count=chunk.get("eval_count", 0),
+                                     eval_duration_ms=chunk.get("eval_duration", 0) / 1e6,
+                                     prompt_eval_count=chunk.get("prompt_eval_count", 0))
+                if complete or done:
+                    break
+            else:
+                raise ServerError("Ollama closed the stream before it finished")
+        finally:
+            # Closing mid-stream drops the connection, which makes Ollama stop generating
+            response.close()
+
+        metrics.annotate(tokens_streamed=len(pieces), stopped_early=not done,
+                         first_token_ms=round((first_token_at - started) * 1000, 3) if first_token_at else None)
+
+        return scanner.text if scanner.complete else "".join(pieces)
+
+
+
+class AsyncOllamaClient:
+    """asyncio counterpart of OllamaClient for callers running an event loop.
+
+    Speaks just enough HTTP/1.1 over asyncio streams to POST /api/generate
+    and read the streamed reply, so no extra dependency is needed. It uses
+    the endpoints, timeouts, retry policy and circuit breakers of the sync
+    client it wraps, so both see the same endpoint health.
+    """
+
+    def __init__(self, sync_client):
+        self.sync = sync_client
+
+    async def generate(self, model, prompt, options=None, timeout=DEFAULT_TIMEOUT):
+        """Same contract as OllamaClient.generate, without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        remaining = timeout  # generation time left; queueing for a slot is free
+        last_error = None
+
+        for attempt in range(self.sync.retries + 1):
+            if attempt:
+                delay = self.sync.backoff * (2 ** (attempt - 1))
+                if timeout:
+                    delay = min(delay, max(0, remaining))
+                    remaining -= delay
+                await asyncio.sleep(delay)
+
+            endpoint = self.sync._pick_endpoint()
+            if endpoint is None:
+                raise OllamaUnavailable("All Ollama endpoints are failing, circuit open")
+
+            await self.sync.in_flight.acquire_async()
+            started = loop.time()
+            deadline = started + remaining if timeout else None
+            if deadline and remaining <= 0:
+                self.sync.in_flight.release()
+                break
+
+            breaker = self.sync.breakers[endpoint]
+            try:
+                text = await self._stream(endpoint, model, prompt, options, deadline, timeout)
+            except (OSError, EOFError, asyncio.TimeoutError, ServerError) as e:
+                # EOFError covers IncompleteReadError: the server went away mid-stream
+                breaker.record_failure()
+                last_error = e
+                print(f"Ollama attempt {attempt + 1} on {endpoint} failed: {e!r}", file=sys.stderr)
+                continue
+            except OllamaTimeout:
+                breaker.record_failure()
+                raise
+            except Exception:
+                breaker.record_success()
+                raise
+            finally:
+                self.sync.in_flight.release()
+                if timeout:
+                    remaining -= loop.time() - started
+
+            breaker.record_success()
+            metrics.annotate(attempts=attempt + 1, endpoint=endpoint)
+            return text
+
+        if last_error is None:
+            raise OllamaTimeout(f"Ollama generation exceeded {timeout}s")
+        raise last_error
+
+    async def _stream(self, endpoint, model, prompt, options, deadline, timeout):
+        loop = asyncio.get_running_loop()
+
+        async def io(awaitable, limit):
+            # Per-read timeout, clipped to the overall deadline
+            if deadline:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise OllamaTimeout(f"Ollama generation exceeded {timeout}s")
+                limit = min(limit, remaining)
+            try:
+                return await asyncio.wait_for(awaitable, limit)
+            except asyncio.TimeoutError:
+                if deadline and loop.time() >= deadline:
+                    raise OllamaTimeout(f"Ollama generation exceeded {timeout}s")
+                raise
+
+        url = urllib.parse.urlsplit(endpoint)
+        https = url.scheme == "https"
+        reader, writer = await io(asyncio.open_connection(url.hostname, url.port or (443 if https else 80),
+                                                          ssl=https or None),
+                                  self.sync.connect_timeout)
+
+        def read(awaitable):
+            return io(awaitable, self.sync.read_timeout)
+
+        scanner = JsonObjectScanner()
+        pieces = []
+        first_token_at = None
+        done = False
+        started = time.perf_counter()
+
+        try:
+            body = json_backend.dumps({
+                "model": model,
+                "prompt": prompt,
+                "stream": True,
+                "options": options or {}
+            }).encode("utf-8")
+            writer.write((f"POST {url.path.rstrip('/')}/api/generate HTTP/1.1\r\n"
+                          f"Host: {url.netloc}\r\n"
+                          "Content-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n"
+                          "Connection: close\r\n\r\n").encode("latin-1") + body)
+            await read(writer.drain())
+
+            status_line = await read(reader.readline())
+            parts = status_line.split()
+            if len(parts) < 2 or not parts[1].isdigit():
+                raise ServerError(f"Malformed response from Ollama: {status_line[:80]!r}")
+            status = int(parts[1])
+            headers = {}
+            while True:
+                line = await read(reader.readline())
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if status >= 500:
+                raise ServerError(f"Ollama returned {status}")
+            if status >= 400:
+                raise RuntimeError(f"Ollama returned {status}")
+
+            async for line in _iter_body_lines(reader, headers, read):
+                if deadline and loop.time() > deadline:
+                    raise OllamaTimeout(f"Ollama generation exceeded {timeout}s")
+                if not line.strip():
+                    continue
+
+                chunk = json_backend.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+
+                piece = chunk.get("response", "")
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                pieces.append(piece)
+                complete = scanner.feed(piece)
+                done = bool(chunk.get("done"))
+                if done:
+                    metrics.annotate(eval_count=chunk.get("eval_count", 0),
+                                     eval_duration_ms=chunk.get("eval_duration", 0) / 1e6,
+                                     prompt_eval_count=chunk.get("prompt_eval_count", 0))
+                if complete or done:
+                    break
+            else:
+                raise ServerError("Ollama closed the stream before it finished")
+        finally:
+            # Dropping the connection mid-stream makes Ollama stop generating
+            writer.close()
+
+        metrics.annotate(tokens_streamed=len(pieces), stopped_early=not done,
+                         first_token_ms=round((first_token_at - started) * 1000, 3) if first_token_at else None)
+
+        return scanner.text if scanner.complete else "".join(pieces)
+
+
+async def _iter_body_lines(reader, headers, read):
+    """Yield lines of an HTTP response body (chunked, sized or close-delimited)."""
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        buffer = b""
+        while True:
+            size = int((await read(reader.readline())).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                break
+            buffer += (await read(reader.readexactly(size + 2)))[:-2]
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line
+        if buffer:
+            yield buffer
+        return
+
+    if "content-length" in headers:
+        body = await read(reader.readexactly(int(headers["content-length"])))
+        for line in body.split(b"\n"):
+            yield line
+        return
+
+    while True:
+        line = await read(reader.readline())
+        if not line:
+            return
+        yield line
+
+
+client = OllamaClient.from_env()
+async_client = AsyncOllamaClient(client)
+
+
+def generate(model, prompt, options=None, timeout=DEFAULT_TIMEOUT):
+    """Generate through the shared client; see OllamaClient.generate."""
+    return client.generate(model, prompt, options, timeout=timeout)
+
+
+async def generate_async(model, prompt, options=None, timeout=DEFAULT_TIMEOUT):
+    """Generate through the shared client without blocking the event loop."""
+    return await async_client.generate(model, prompt, options, timeout=timeout)
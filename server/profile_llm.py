@@ -0,0 +1,195 @@
+import asyncio
+import functools
+import sys
+
+import metrics
+import ollama_client
+from llm_cache import cache
+from message_sampler import message_groups, sample_groups, sample_titles
+from profile_mapreduce import chunk_conversations, map_reduce_profile, merge_window_profiles
+
+# ----------------------------
+# CACHED JSON CALLS
+# ----------------------------
+# The cache -> generate -> parse -> cache steps are written once, as a
+# generator, and driven by a blocking and an asyncio driver that only
+# differ in how they perform the I/O it asks for.
+_GENERATE = object()  # step: call Ollama, send back the text or None
+
+
+def _json_call(model, prompt, options, validate):
+    """Steps of one cached JSON call; yields I/O requests, returns the parsed object or None.
+
+    Yields a zero-argument callable for blocking cache I/O, or _GENERATE
+    for the model call, and expects its result to be sent back.
+    """
+    with metrics.span("llm_call", model=model, prompt_chars=len(prompt), ok=False) as call:
+        result = yield functools.partial(cache.get, model, prompt, options)
+        from_cache = result is not None
+        call["cache_hit"] = from_cache
+
+        if not from_cache:
+            result = yield _GENERATE
+            if result is None:
+                return None
+
+        parsed = ollama_client.parse_json_object(result)
+        if parsed is None or (validate is not None and not validate(parsed)):
+            print(f"Unusable JSON from {model}", file=sys.stderr)
+            return None
+        if not from_cache:
+            # Only cache answers we could actually use
+            yield functools.partial(cache.put, model, prompt, result, options)
+        call["ok"] = True
+        return parsed
+
+
+def generate_json(model, prompt, options=None, validate=None, timeout=ollama_client.DEFAULT_TIMEOUT):
+    """Ask Ollama for a JSON object, serving repeats from the on-disk cache; None on failure."""
+    steps = _json_call(model, prompt, options, validate)
+    value = None
+    try:
+        while True:
+            step = steps.send(value)
+            if step is not _GENERATE:
+                value = step()
+                continue
+            try:
+                # Streams and stops as soon as the JSON object closes
+                value = ollama_client.generate(model, prompt, options, timeout=timeout)
+            except Exception as e:
+                print(f"Ollama request failed: {e!r}", file=sys.stderr)
+                value = None
+    except StopIteration as done:
+        return done.value
+    finally:
+        steps.close()
+
+
+async def generate_json_async(model, prompt, options=None, validate=None, timeout=ollama_client.DEFAULT_TIMEOUT):
+    """generate_json on the event loop: cache I/O in the default executor, Ollama via the async client."""
+    loop = asyncio.get_running_loop()
+    steps = _json_call(model, prompt, options, validate)
+    value = None
+    try:
+        while True:
+            step = steps.send(value)
+            if step is not _GENERATE:
+                value = await loop.run_in_executor(None, step)
+                continue
+            try:
+                value = await ollama_client.generate_async(model, prompt, options, timeout=timeout)
+            except Exception as e:
+                print(f"Ollama request failed: {e!r}", file=sys.stderr)
+                value = None
+    except StopIteration as done:
+        return done.value
+    finally:
+        steps.close()
+
+
+# ----------------------------
+# PROFILE FLOWS
+# ----------------------------
+class ProfileFlow:
+    """What one parser's LLM profiling is made of: model, options, prompt and sample size.
+
+    `prompt(sample_text, titles)` builds the request; `validate(profile)`,
+    if given, rejects answers that parse but are not usable profiles.
+    """
+
+    def __init__(self, model, options, prompt, validate=None, token_budget=2000):
+        self.model = model
+        self.options = options
+        self.prompt = prompt
+        self.validate = validate
+        self.token_budget = token_budget
+
+    def sample_prompt(self, groups, titles, user_count):
+        """Prompt over a representative sample of per-conversation message groups."""
+        with metrics.span("sample", token_budget=self.token_budget, user_messages=user_count) as sample:
+            sampled = sample_groups(groups, token_budget=self.token_budget)
+            sample_text = "\n".join(sampled)
+            sample.update(sampled=len(sampled), chars=len(sample_text))
+        return self.prompt(sample_text, titles)
+
+    def window_prompt(self, window):
+        """Prompt over every message of one map-reduce window."""
+        text = "\n".join(m["content"] for c in window for m in c["messages"])
+        return self.prompt(text, sample_titles(window, 20))
+
+    def ask(self, prompt, timeout=ollama_client.DEFAULT_TIMEOUT):
+        return generate_json(self.model, prompt, self.options, validate=self.validate, timeout=timeout)
+
+    async def ask_async(self, prompt, timeout=ollama_client.DEFAULT_TIMEOUT):
+        return await generate_json_async(self.model, prompt, self.options, validate=self.validate,
+                                         timeout=timeout)
+
+
+def profile_sources(user_messages, conversations):
+    """Conversations to sample from; bare messages become one conversation."""
+    if conversations:
+        return conversations
+    # Filter out any non-string items that might have snuck in
+    string_messages = [str(m) for m in user_messages if m and isinstance(m, (str, int, float))]
+    return [{"messages": [{"role": "user", "content": m} for m in string_messages]}]
+
+
+def llm_profile(flow, user_messages, conversations, map_reduce=False, concurrency=None,
+                timeout=ollama_client.DEFAULT_TIMEOUT):
+    """LLM profile of the given messages, or None if the LLM could not produce one."""
+    sources = profile_sources(user_messages, conversations)
+    if map_reduce:
+        # Every message gets analyzed, spread across concurrent Ollama calls
+        return map_reduce_profile(sources, lambda window: flow.ask(flow.window_prompt(window), timeout),
+                                  concurrency=concurrency or ollama_client.client.max_in_flight)
+    prompt = flow.sample_prompt(message_groups(sources), sample_titles(conversations, 20), len(user_messages))
+    return flow.ask(prompt, timeout)
+
+
+# ----------------------------
+# ASYNCIO VARIANT
+# ----------------------------
+def _with_spans(fn, *args):
+    # Module-level so it pickles into a ProcessPoolExecutor
+    with metrics.collecting() as collector:
+        result = fn(*args)
+    return result, collector.spans
+
+
+async def run_blocking(executor, fn, *args):
+    """Run CPU-bound work off the event loop, keeping the metrics it records."""
+    loop = asyncio.get_running_loop()
+    result, spans = await loop.run_in_executor(executor, functools.partial(_with_spans, fn, *args))
+    metrics.current().extend(spans)
+    return result
+
+
+async def llm_profile_async(flow, user_messages, conversations, map_reduce=False, concurrency=None,
+                            timeout=ollama_client.DEFAULT_TIMEOUT, executor=None):
+    """llm_profile without blocking the event loop; sampling runs on `executor`.
+
+    Map-reduce windows are concurrent requests rather than pool threads.
+    The Ollama client's shared request limit bounds them together with
+    every other upload; `concurrency` only caps this call further.
+    """
+    sources = profile_sources(user_messages, conversations)
+    if not map_reduce:
+        prompt = await run_blocking(executor, _sample_prompt, flow, sources, conversations, len(user_messages))
+        return await flow.ask_async(prompt, timeout)
+
+    windows = list(chunk_conversations(sources))
+    limit = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def analyze(window):
+        if limit is None:
+            return await flow.ask_async(flow.window_prompt(window), timeout)
+        async with limit:
+            return await flow.ask_async(flow.window_prompt(window), timeout)
+
+    results = await asyncio.gather(*(analyze(window) for window in windows))
+    return merge_window_profiles(windows, results)
+
+
+def _sample_prompt(flow, sources, conversations, user_count):
+    return flow.sample_prompt(message_groups(sources), sample_titles(conversations, 20), user_count)
@@ -0,0 +1,155 @@
+import contextvars
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from message_sampler import CHARS_PER_TOKEN, estimate_tokens
+
+# ----------------------------
+# MAP-REDUCE PROFILE EXTRACTION
+# ----------------------------
+DEFAULT_WINDOW_TOKENS = 1500
+
+SCALAR_FIELDS = {
+    "identityTraits": ["name", "age", "location", "profession"],
+    "preferences": ["communication_style", "learning_style"],
+}
+LIST_FIELDS = {
+    ("identityTraits", "personality"): 4,
+    ("preferences", "topics"): 8,
+    ("interests",): 12,
+    ("factualMemory", "projects"): 10,
+    ("factualMemory", "skills"): 10,
+    ("factualMemory", "tools"): 10,
+    ("factualMemory", "experiences"): 10,
+}
+_UNKNOWN = {"", "unknown", "none", "n/a", "not mentioned"}
+
+
+def chunk_conversations(conversations, window_tokens=DEFAULT_WINDOW_TOKENS, role="user"):
+    """Split conversations into windows of at most `window_tokens` of `role` text.
+
+    Conversations are kept whole when they fit, and split at message
+    boundaries otherwise. A single message longer than the window is
+    clipped. Each window is a list of {title, messages} records, in export
+    order.
+    """
+    max_chars = window_tokens * CHARS_PER_TOKEN
+    window, used = [], 0
+
+    for conv in conversations:
+        title = conv.get("title", "Unknown")
+        current = []
+        for m in conv.get("messages", []):
+            if m.get("role") != role or not isinstance(m.get("content"), str):
+                continue
+            content = m["content"][:max_chars]
+            cost = estimate_tokens(content) + 1
+            if used + cost > window_tokens and (window or current):
+                if current:
+                    window.append({"title": title, "messages": current})
+                yield window
+                window, current, used = [], [], 0
+            current.append({"role": role, "content": content, "weight": m.get("weight", 1)})
+            used += cost
+        if current:
+            window.append({"title": title, "messages": current})
+
+    if window:
+        yield window
+
+
+def _is_known(value):
+    return isinstance(value, str) and value.strip().lower() not in _UNKNOWN
+
+
+def _get(profile, path):
+    value = profile
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def merge_profiles(partials):
+    """Deterministically merge partial profiles into one.
+
+    `partials` is a list of (profile, weight) pairs in chunk order; weight
+    is the confidence of that chunk (e.g. how much text it covered).
+    Scalar traits take the value with the highest total weight, ignoring
+    "Unknown". List traits are ranked by total weight across chunks,
+    compared case-insensitively. Ties go to the value seen first.
+    """
+    merged = {
+        "identityTraits": {},
+        "preferences": {},
+        "interests": [],
+        "factualMemory": {},
+    }
+
+    for section, fields in SCALAR_FIELDS.items():
+        for field in fields:
+            scores = Counter()
+            display = {}
+            for profile, weight in partials:
+                value = _get(profile, (section, field))
+                if _is_known(value):
+                    key = value.strip().lower()
+                    scores[key] += weight
+                    display.setdefault(key, value.strip())
+            best = max(display, key=lambda k: scores[k]) if display else None
+            merged[section][field] = display[best] if best else "Unknown"
+
+    for path, limit in LIST_FIELDS.items():
+        scores = defaultdict(float)
+        display = {}
+        for profile, weight in partials:
+            values = _get(profile, path)
+            if not isinstance(values, list):
+                continue
+            for value in dict.fromkeys(v.strip() for v in values if _is_known(v)):
+                key = value.lower()
+                scores[key] += weight
+                display.setdefault(key, value)
+        ranked = sorted(display, key=lambda k: -scores[k])[:limit]
+        target = merged
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = [display[k] for k in ranked]
+
+    return merged
+
+
+def window_weight(window):
+    """Merge weight of a window: its messages, counting collapsed duplicates."""
+    return sum(m.get("weight", 1) for c in window for m in c["messages"])
+
+
+def map_reduce_profile(conversations, analyze_chunk, concurrency=4, window_tokens=DEFAULT_WINDOW_TOKENS):
+    """Extract partial profiles per window concurrently, then merge them.
+
+    `analyze_chunk(window)` returns a profile dict or None on failure.
+    Returns None when no window produced a profile, so callers can fall
+    back to keyword analysis.
+    """
+    windows = list(chunk_conversations(conversations, window_tokens))
+    if not windows:
+        return None
+
+    # Run each window in a copy of the caller's context so per-job metrics follow it
+    contexts = [contextvars.copy_context() for _ in windows]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # map() keeps chunk order, which keeps the merge deterministic
+        results = list(pool.map(lambda ctx, window: ctx.run(analyze_chunk, window), contexts, windows))
+
+    return merge_window_profiles(windows, results)
+
+
+def merge_window_profiles(windows, results):
+    """Reduce step: merge each window's profile by window_weight, skipping failures.
+
+    Returns None when no window produced a profile.
+    """
+    partials = [(profile, window_weight(window)) for window, profile in zip(windows, results)
+                if isinstance(profile, dict)]
+    if not partials:
+        return None
+    return merge_profiles(partials)
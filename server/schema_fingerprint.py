@@ -0,0 +1,108 @@
+import hashlib
+import re
+
+# ----------------------------
+# EXPORT SCHEMA FINGERPRINTING
+# ----------------------------
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_MAX_KEYS = 32
+
+CHATGPT_MAPPING = {
+    "schema": "chatgpt_mapping",
+    "root_type": "list",
+    "conversation_path": "direct",
+    "message_path": "mapping",
+    "content_field": "parts",
+    "user_role_identifier": "user"
+}
+
+CONVERSATIONS_OBJECT = {
+    "schema": "conversations_object",
+    "root_type": "dict",
+    "conversation_path": "conversations",
+    "message_path": "messages",
+    "content_field": "content",
+    "user_role_identifier": "user"
+}
+
+CONVERSATION_LIST = {
+    "schema": "conversation_list",
+    "root_type": "list",
+    "conversation_path": "direct",
+    "message_path": "messages",
+    "content_field": "content",
+    "user_role_identifier": "user"
+}
+
+MESSAGE_LIST = {
+    "schema": "message_list",
+    "root_type": "list",
+    "conversation_path": "root",
+    "message_path": "direct",
+    "content_field": "content",
+    "user_role_identifier": "user"
+}
+
+
+def _first(items):
+    return items[0] if isinstance(items, list) and items else None
+
+
+def _is_message(value):
+    return isinstance(value, dict) and "content" in value and ("role" in value or "author" in value)
+
+
+def _has_messages(value):
+    return isinstance(value, dict) and isinstance(value.get("messages"), list) and \
+        (not value["messages"] or _is_message(value["messages"][0]))
+
+
+def detect_schema(json_data):
+    """Recognize a known export layout from its first items, or return None.
+
+    Only the root and the first element or two are inspected, so this is
+    cheap enough to run on every upload before deciding whether the LLM
+    needs to look at the structure at all.
+    """
+    if isinstance(json_data, list):
+        first = _first(json_data)
+        if isinstance(first, dict) and isinstance(first.get("mapping"), dict):
+            return dict(CHATGPT_MAPPING)
+        if _has_messages(first):
+            return dict(CONVERSATION_LIST)
+        if _is_message(first):
+            return dict(MESSAGE_LIST)
+    elif isinstance(json_data, dict):
+        conversations = json_data.get("conversations")
+        if isinstance(conversations, list):
+            first = _first(conversations)
+            if first is None or _has_messages(first):
+                return dict(CONVERSATIONS_OBJECT)
+            if isinstance(first, dict) and isinstance(first.get("mapping"), dict):
+                return dict(CHATGPT_MAPPING, root_type="dict", conversation_path="conversations")
+        if _has_messages(json_data):
+            return dict(CONVERSATION_LIST, root_type="dict", conversation_path="root")
+    return None
+
+
+def _shape(value, depth):
+    if isinstance(value, dict):
+        if depth <= 0:
+            return "{}"
+        keys = list(value)
+        # Id-keyed maps (node uuids etc.) vary per file; describe them by their values
+        if len(keys) > _MAX_KEYS or not all(isinstance(k, str) and _IDENTIFIER.match(k) for k in keys):
+            return "{*:" + (_shape(value[keys[0]], depth - 1) if keys else "") + "}"
+        return "{" + ",".join(f"{k}:{_shape(value[k], depth - 1)}" for k in sorted(keys)) + "}"
+    if isinstance(value, list):
+        if depth <= 0 or not value:
+            return "[]"
+        return "[" + _shape(value[0], depth - 1) + "]"
+    if value is None:
+        return "null"
+    return type(value).__name__
+
+
+def fingerprint(json_data, depth=4):
+    """Stable hash of the data's key layout, independent of its values."""
+    return hashlib.sha1(_shape(json_data, depth).encode("utf-8")).hexdigest()[:16]
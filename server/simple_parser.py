@@ -1,12 +1,50 @@
 #!/usr/bin/env python3
 import argparse
+import concurrent.futures
+import itertools
 import json
-import requests
+import socketserver
 import sys
 import os
+import threading
+
+import json_backend
+import metrics
+from conversation_store import ConversationStore
+from conversation_tree import iter_active_messages, message_text
+from export_source import is_zip_export, open_export
+from incremental_profile import ProfileState, conversation_key
+from json_stream import iter_json_items, json_root_is_array
+from keyword_taxonomy import get_taxonomy
+from llm_cache import cache, structure_cache
+from message_dedup import dedup_conversations, dedup_groups, weighted_texts
+from message_sampler import spread_titles
+import profile_llm
+from profile_llm import ProfileFlow, generate_json
+from profile_mapreduce import merge_profiles
+from schema_fingerprint import detect_schema, fingerprint
 
 def analyze_json_structure_with_llm(json_data):
     """Use LLM to understand the structure of the JSON data"""
+    with metrics.span("structure_detect") as detect:
+        structure = _analyze_json_structure(json_data, detect)
+        detect["schema"] = structure.get("schema")
+        return structure
+
+def _analyze_json_structure(json_data, detect):
+    # Known export layouts are recognized locally, no LLM round-trip needed
+    known = detect_schema(json_data)
+    if known is not None:
+        detect["method"] = "known"
+        return known
+    
+    # Unknown layout: reuse the answer from the last time we saw this shape
+    shape = fingerprint(json_data)
+    cached = structure_cache.get("structure", shape)
+    if cached is not None:
+        detect["method"] = "fingerprint_cache"
+        return json.loads(cached)
+    
     # Take a small sample to analyze structure
     if isinstance(json_data, list) and len(json_data) > 0:
         sample = json_data[:2]  # Just first 2 items
@@ -40,28 +78,14 @@ Format:
 }}
 """
 
-    try:
-        response = requests.post("http://localhost:11434/api/generate", json={
-            "model": "llama3.2:3b",
-            "prompt": prompt,
-            "stream": False,
-            "options": {"temperature": 0.1}
-        })
-        
-        if response.status_code == 200:
-            result = response.json().get("response", "")
-            start = result.find("{")
-            end = result.rfind("}") + 1
-            
-            if start >= 0 and end > start:
-                try:
-                    return json.loads(result[start:end])
-                except:
-                    pass
-    except:
-        pass
+    structure = generate_json("llama3.2:3b", prompt, {"temperature": 0.1})
+    if structure is not None:
+        structure_cache.put("structure", shape, json.dumps(structure))
+        detect["method"] = "llm"
+        return structure
     
     # Fallback structure for ChatGPT exports
+    detect["method"] = "default"
     return {
         "root_type": "list",
         "conversation_path": "direct",
@@ -70,43 +94,117 @@ Format:
         "user_role_identifier": "user"
     }
 
+def extract_conversation_record(conv):
+    """Extract a {title, messages} record from a single ChatGPT conversation"""
+    if not isinstance(conv, dict) or 'mapping' not in conv:
+        return None
+
+    title = conv.get('title', 'Unknown')
+    conv_messages = []
+
+    # Follow the active branch instead of every node in the mapping
+    for msg in iter_active_messages(conv):
+        content = message_text(msg).strip()
+        if content:
+            conv_messages.append({
+                "role": msg.get('author', {}).get('role', ''),
+                "content": content,
+                "timestamp": msg.get("create_time", 0)
+            })
+
+    if not conv_messages:
+        return None
+
+    return {
+        "title": title,
+        "messages": conv_messages
+    }
+
+def extract_message_list_record(title, messages):
+    """Extract a {title, messages} record from a flat list of role/content messages"""
+    conv_messages = []
+
+    for msg in messages:
+        if not isinstance(msg, dict):
+            continue
+        role = msg.get('role') or msg.get('author', {}).get('role', '')
+        content = msg.get('content')
+        if isinstance(content, dict):
+            # Every text part, as for mapping exports; empty parts give ''
+            content = message_text(msg)
+        elif isinstance(content, list):
+            content = "\n".join(p for p in content if isinstance(p, str) and p)
+
+        if content and str(content).strip():
+            conv_messages.append({
+                "role": role,
+                "content": str(content).strip(),
+                "timestamp": msg.get("create_time", msg.get("timestamp", 0))
+            })
+
+    if not conv_messages:
+        return None
+
+    return {
+        "title": title,
+        "messages": conv_messages
+    }
+
+def extract_record(conv, schema="chatgpt_mapping"):
+    """Extract one conversation item according to the detected schema"""
+    if schema in ("conversation_list", "conversations_object"):
+        if not isinstance(conv, dict):
+            return None
+        return extract_message_list_record(conv.get('title', 'Unknown'), conv.get('messages', []))
+    return extract_conversation_record(conv)
+
+def iter_conversations_dynamic(items, limit=None, schema="chatgpt_mapping"):
+    """Yield extracted conversations from an iterable of top-level export items.
+
+    Every conversation is extracted by default; the sampler, not a cut-off
+    here, keeps the prompt within budget. `limit` caps the item count.
+    """
+    if schema == "message_list":
+        # The whole list is a single conversation
+        record = extract_message_list_record("Unknown", items)
+        if record:
+            yield record
+        return
+
+    for conv in itertools.islice(items, limit):
+        record = extract_record(conv, schema)
+        if record:
+            yield record
+
+def _conversation_items(json_data, structure_info):
+    """Locate the list of conversations for the detected schema"""
+    path = structure_info.get("conversation_path")
+    if isinstance(json_data, dict):
+        if path == "root":
+            return [json_data]
+        if path == "conversations":
+            return json_data.get("conversations", [])
+        return []
+    return json_data if isinstance(json_data, list) else []
+
 def extract_conversations_dynamic(json_data, structure_info):
-    """Extract conversations using the structure info from LLM"""
+    """Extract conversations using the detected or LLM-inferred structure"""
     conversations = []
     user_messages = []
     
     try:
-        # Handle ChatGPT format specifically (most common case)
-        if isinstance(json_data, list):
-            for conv in json_data[:50]:  # Limit to first 50 conversations
-                if 'mapping' in conv:
-                    title = conv.get('title', 'Unknown')
-                    mapping = conv['mapping']
-                    conv_messages = []
-                    
-                    for node in mapping.values():
-                        msg = node.get('message')
-                        if msg and msg.get('content'):
-                            role = msg.get('author', {}).get('role', '')
-                            parts = msg.get('content', {}).get('parts', [])
-                            
-                            if parts and parts[0] and str(parts[0]).strip():
-                                content = str(parts[0]).strip()
-                                conv_messages.append({
-                                    "role": role,
-                                    "content": content,
-                                    "timestamp": msg.get("create_time", 0)
-                                })
-                                
-                                # Collect user messages
-                                if role == "user":
-                                    user_messages.append(content)
-                    
-                    if conv_messages:
-                        conversations.append({
-                            "title": title,
-                            "messages": conv_messages
-                        })
+        with metrics.span("extract") as extract:
+            # ChatGPT mapping format is the default (most common case)
+            schema = structure_info.get("schema", "chatgpt_mapping")
+            items = _conversation_items(json_data, structure_info)
+            message_count = 0
+            for record in iter_conversations_dynamic(items, schema=schema):
+                conversations.append(record)
+                message_count += len(record["messages"])
+                # Collect user messages
+                user_messages.extend(m["content"] for m in record["messages"] if m["role"] == "user")
+            extract.update(conversations=len(conversations), messages=message_count,
+                           user_messages=len(user_messages))
         
         print(f"Extracted {len(conversations)} conversations, {len(user_messages)} user messages", file=sys.stderr)
         return conversations, user_messages
@@ -115,25 +213,57 @@ def extract_conversations_dynamic(json_data, structure_info):
         print(f"Error extracting conversations: {e}", file=sys.stderr)
         return [], []
 
-def create_user_profile_with_llm(user_messages, conversations):
-    """Create user profile using LLM analysis"""
-    if not user_messages:
-        return create_fallback_profile()
-    
-    # Sample the data
-    sample_messages = user_messages[:100]  # First 100 user messages
-    sample_text = "\n".join(sample_messages)[:8000]  # Limit text size
-    
-    conv_titles = [c.get("title", "") for c in conversations[:30]]
-    
-    prompt = f"""
+def stream_conversations_dynamic(file_path):
+    """Extract conversations by streaming the export instead of loading it whole"""
+    conversations = []
+    user_messages = []
+
+    with open_export(file_path) as f:
+        if not json_root_is_array(f):
+            # Only list exports can be streamed; an object root is decoded
+            # whole and extracted exactly as the load path would
+            with metrics.span("load", bytes=os.path.getsize(file_path), stream=True) as load:
+                data = json_backend.load(f)
+                load["items"] = 1
+            structure_info = analyze_json_structure_with_llm(data)
+            print(f"Structure analysis: {structure_info}", file=sys.stderr)
+            return extract_conversations_dynamic(data, structure_info)
+
+        items = iter_json_items(f)
+        # Keep a tiny head of the stream for structure analysis
+        with metrics.span("load", bytes=os.path.getsize(file_path), stream=True):
+            head = list(itertools.islice(items, 2))
+
+        structure_info = analyze_json_structure_with_llm(head)
+        print(f"Structure analysis: {structure_info}", file=sys.stderr)
+
+        # Decoding the rest of the stream is interleaved with extraction
+        with metrics.span("extract", stream=True) as extract:
+            schema = structure_info.get("schema", "chatgpt_mapping")
+            message_count = 0
+            for record in iter_conversations_dynamic(itertools.chain(head, items), schema=schema):
+                conversations.append(record)
+                message_count += len(record["messages"])
+                user_messages.extend(m["content"] for m in record["messages"] if m["role"] == "user")
+            extract.update(conversations=len(conversations), messages=message_count,
+                           user_messages=len(user_messages))
+
+    print(f"Extracted {len(conversations)} conversations, {len(user_messages)} user messages", file=sys.stderr)
+    return conversations, user_messages
+
+PROFILE_MODEL = "llama3.2:3b"
+PROFILE_OPTIONS = {"temperature": 0.3}
+
+def profile_prompt(sample_text, conv_titles):
+    """Prompt asking for a profile of one block of user text"""
+    return f"""
 Analyze these user messages from ChatGPT conversations to create a user profile.
 
 USER MESSAGES:
 {sample_text}
 
 CONVERSATION TITLES:
-{json.dumps(conv_titles[:20], indent=2)}
+{json.dumps(conv_titles, indent=2)}
 
 Create a detailed user profile. Respond with ONLY this JSON:
 
@@ -160,57 +290,49 @@ Create a detailed user profile. Respond with ONLY this JSON:
 }}
 """
 
-    try:
-        response = requests.post("http://localhost:11434/api/generate", json={
-            "model": "llama3.2:3b", 
-            "prompt": prompt,
-            "stream": False,
-            "options": {"temperature": 0.3}
-        })
-        
-        if response.status_code == 200:
-            result = response.json().get("response", "")
-            start = result.find("{")
-            end = result.rfind("}") + 1
-            
-            if start >= 0 and end > start:
-                try:
-                    profile = json.loads(result[start:end])
-                    # Validate basic structure
-                    if "identityTraits" in profile and "preferences" in profile:
-                        return profile
-                except:
-                    pass
-    except:
-        pass
+def is_valid_profile(profile):
+    """Validate basic structure"""
+    return "identityTraits" in profile and "preferences" in profile
+
+PROFILE_FLOW = ProfileFlow(PROFILE_MODEL, PROFILE_OPTIONS, profile_prompt, validate=is_valid_profile,
+                           token_budget=2000)  # ~8000 characters of sampled messages
+
+def llm_profile(user_messages, conversations, map_reduce=False, concurrency=None):
+    """LLM profile of the given messages, or None if the LLM could not produce one"""
+    return profile_llm.llm_profile(PROFILE_FLOW, user_messages, conversations, map_reduce=map_reduce,
+                                   concurrency=concurrency)
+
+def create_user_profile_with_llm(user_messages, conversations, map_reduce=False, concurrency=None):
+    """Create user profile using LLM analysis"""
+    if not user_messages:
+        return create_fallback_profile()
+    
+    profile = llm_profile(user_messages, conversations, map_reduce=map_reduce, concurrency=concurrency)
+    if profile is not None:
+        return profile
     
     # Fallback to keyword analysis
-    return create_fallback_profile_from_messages(user_messages, conversations)
+    with metrics.span("fallback", user_messages=len(user_messages)):
+        return create_fallback_profile_from_messages(user_messages, conversations)
 
 def create_fallback_profile_from_messages(user_messages, conversations):
     """Create profile using simple keyword matching"""
-    all_text = " ".join(user_messages).lower()
-    titles_text = " ".join([c.get("title", "") for c in conversations]).lower()
-    
-    # Keywords for different domains
-    tech_words = ["javascript", "python", "react", "coding", "programming", "web", "api", 
-                  "database", "sql", "html", "css", "node", "git", "docker", "aws"]
-    business_words = ["business", "marketing", "sales", "strategy", "startup", "finance"]
-    design_words = ["design", "ui", "ux", "figma", "photoshop", "creative"]
+    taxonomy = get_taxonomy()
+    # Count collapsed duplicates by their weight rather than scanning every copy
+    texts, weights = weighted_texts(conversations) if conversations else (user_messages, None)
+    text_counts = taxonomy.count(texts, weights)
+    title_counts = taxonomy.count(c.get("title", "") for c in conversations)
+    return fallback_profile_from_counts(text_counts, title_counts)
+
+def fallback_profile_from_counts(text_counts, title_counts):
+    """Keyword profile from precomputed message and title keyword counts"""
+    taxonomy = get_taxonomy()
     
-    interests = []
-    for word in tech_words + business_words + design_words:
-        if word in all_text or word in titles_text:
-            interests.append(word.title())
+    # Most frequently mentioned first
+    interests = [w.title() for w in taxonomy.rank_interests(text_counts + title_counts)]
     
     # Infer profession
-    profession = "Unknown"
-    if any(w in all_text for w in ["code", "programming", "javascript", "python"]):
-        profession = "Software Developer"
-    elif any(w in all_text for w in ["design", "ui", "ux"]):
-        profession = "Designer"
-    elif any(w in all_text for w in ["business", "marketing"]):
-        profession = "Business Professional"
+    profession = taxonomy.infer_profession(text_counts)
     
     return {
         "identityTraits": {
@@ -229,7 +351,7 @@ def create_fallback_profile_from_messages(user_messages, conversations):
         "factualMemory": {
             "projects": [],
             "skills": interests[:5] if interests else ["Problem Solving"],
-            "tools": [w.title() for w in tech_words if w in all_text][:5],
+            "tools": [w.title() for w in taxonomy.rank_tools(text_counts)][:5],
             "experiences": []
         }
     }
@@ -258,40 +380,284 @@ def create_fallback_profile():
         }
     }
 
-def main():
-    parser = argparse.ArgumentParser(description="Simple ChatGPT conversation parser")
-    parser.add_argument("--json-file", required=True, help="Path to JSON conversation file")
-    args = parser.parse_args()
+def load_conversations(json_file, stream=False):
+    """Parse and extract an export into (conversations, user_messages)"""
+    # ZIP exports are always streamed straight out of the archive
+    if stream or is_zip_export(json_file):
+        return stream_conversations_dynamic(json_file)
+
+    # Load the JSON file
+    with metrics.span("load", bytes=os.path.getsize(json_file), stream=False) as load:
+        with open_export(json_file) as f:
+            data = json_backend.load(f)
+        load["items"] = len(data) if isinstance(data, list) else 1
     
+    # Step 1: Understand structure with LLM
+    structure_info = analyze_json_structure_with_llm(data)
+    print(f"Structure analysis: {structure_info}", file=sys.stderr)
+    
+    # Step 2: Extract conversations based on structure
+    return extract_conversations_dynamic(data, structure_info)
+
+def dedup_records(conversations):
+    """Collapse repeated prompts before analysis; returns (conversations, user_messages)"""
+    with metrics.span("dedup") as dedup:
+        conversations, stats = dedup_conversations(conversations)
+        dedup.update(stats)
+    return conversations, [m["content"] for c in conversations for m in c["messages"] if m["role"] == "user"]
+
+def profile_from_store(store, map_reduce=False):
+    """Profile a saved ConversationStore straight from its columns.
+
+    Sampling, titles and the keyword fallback read the store's text buffer
+    directly; message dicts are only built for map-reduce windows.
+    """
+    if map_reduce:
+        conversations, user_messages = dedup_records(store.iter_records())
+        if not user_messages:
+            return create_fallback_profile()
+        return create_user_profile_with_llm(user_messages, conversations, map_reduce=True)
+
+    user_count = store.role_count("user")
+    if not user_count:
+        return create_fallback_profile()
+
+    # Collapsed and weighted as dedup_records would, so the prompt (and its
+    # LLM cache entry) is the one the run that built the store used
+    with metrics.span("dedup") as dedup:
+        kept_titles, groups, stats = dedup_groups(store.iter_conversation_texts("user"))
+        dedup.update(stats)
+    prompt = PROFILE_FLOW.sample_prompt(groups, spread_titles(kept_titles, 20), stats["messages_out"])
+    profile = PROFILE_FLOW.ask(prompt)
+    if profile is not None:
+        return profile
+
+    titles = list(store.iter_titles())
+    with metrics.span("fallback", user_messages=user_count):
+        taxonomy = get_taxonomy()
+        return fallback_profile_from_counts(taxonomy.count(store.iter_texts("user")), taxonomy.count(titles))
+
+def build_profile(json_file, stream=False, map_reduce=False, store_path=None):
+    """Run the full parse -> extract -> profile pipeline for one export file"""
     try:
-        # Load the JSON file
-        with open(args.json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        print(f"Loaded JSON with type: {type(data)}", file=sys.stderr)
-        if isinstance(data, list):
-            print(f"List with {len(data)} items", file=sys.stderr)
-        
-        # Step 1: Understand structure with LLM
-        structure_info = analyze_json_structure_with_llm(data)
-        print(f"Structure analysis: {structure_info}", file=sys.stderr)
+        if store_path and ConversationStore.is_fresh(store_path, json_file):
+            # Reuse the columnar store instead of re-reading the export
+            with metrics.span("load", bytes=os.path.getsize(store_path), source="store") as load:
+                store = ConversationStore.open(store_path)
+                load.update(conversations=len(store), messages=store.message_count)
+            print(f"Loaded {len(store)} conversations from {store_path}", file=sys.stderr)
+            return profile_from_store(store, map_reduce=map_reduce)
+
+        conversations, user_messages = load_conversations(json_file, stream)
+        if store_path:
+            ConversationStore.from_records(conversations).save(store_path, source_path=json_file)
         
-        # Step 2: Extract conversations based on structure
-        conversations, user_messages = extract_conversations_dynamic(data, structure_info)
+        # Duplicates are collapsed per run; the store keeps every copy
+        conversations, user_messages = dedup_records(conversations)
         
         # Step 3: Create profile with LLM
         if user_messages:
-            profile = create_user_profile_with_llm(user_messages, conversations)
-        else:
-            profile = create_fallback_profile()
-        
-        # Output the profile
-        print(json.dumps(profile, indent=2))
+            return create_user_profile_with_llm(user_messages, conversations, map_reduce=map_reduce)
+        return create_fallback_profile()
         
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         # Always output a valid profile for MVP
-        print(json.dumps(create_fallback_profile(), indent=2))
+        return create_fallback_profile()
+
+def build_incremental_profile(json_file, state_path, stream=False, map_reduce=False):
+    """Profile only conversations that are new or changed since the last run, or
+    that a failed LLM call left pending, then merge the delta into the profile
+    kept in `state_path`"""
+    state = ProfileState.load(state_path)
+    taxonomy = get_taxonomy()
+    stream = stream or is_zip_export(json_file)
+
+    with open_export(json_file) as f:
+        if stream and json_root_is_array(f):
+            items = iter_json_items(f)
+            head = list(itertools.islice(items, 2))
+            structure_info = analyze_json_structure_with_llm(head)
+            items = itertools.chain(head, items)
+        else:
+            data = json_backend.load(f)
+            structure_info = analyze_json_structure_with_llm(data)
+            items = _conversation_items(data, structure_info)
+
+        schema = structure_info.get("schema", "chatgpt_mapping")
+        if schema == "message_list":
+            # A bare message list has no conversation identity; treat it as one
+            items = [{"title": "Unknown", "messages": list(items)}]
+            schema = "conversation_list"
+
+        conversations = []
+        user_messages = []
+        pending = []  # (id, version) of conversations the LLM delta covers
+        live_ids = set()
+        for conv in items:
+            if not isinstance(conv, dict):
+                continue
+            key = conversation_key(conv)
+            live_ids.add(key[0])
+            changed = state.is_changed(key)
+            # Without a stored LLM profile, the whole history is profiled again
+            if not changed and not state.needs_profile(key):
+                continue
+            record = extract_record(conv, schema)
+            texts = [m["content"] for m in record["messages"] if m["role"] == "user"] if record else []
+            if changed:
+                state.record(key, taxonomy.count(texts),
+                             taxonomy.count([record["title"]] if record else []), len(texts))
+            if texts:
+                conversations.append(record)
+                user_messages.extend(texts)
+                pending.append(key)
+            else:
+                state.mark_profiled([key])
+
+    removed = state.prune(live_ids)
+    print(f"Incremental: {len(conversations)} new, changed or unprofiled conversations, "
+          f"{len(user_messages)} user messages, {removed} removed", file=sys.stderr)
+
+    if user_messages:
+        # Keyword counts above saw every copy; only the LLM input is deduplicated
+        unique_conversations, unique_messages = dedup_records(conversations)
+        delta = llm_profile(unique_messages, unique_conversations, map_reduce=map_reduce)
+        # If the LLM is down, keep the stored profile and leave these
+        # conversations pending so the next run profiles them
+        if delta is not None and state.profile:
+            previous = state.message_count - len(user_messages)
+            state.profile = merge_profiles([(state.profile, max(previous, 1)), (delta, len(user_messages))])
+        elif delta is not None:
+            state.profile = delta
+        if delta is not None:
+            state.mark_profiled(pending)
+
+    state.save(state_path)
+    if state.profile:
+        return state.profile
+    if not state.message_count:
+        return create_fallback_profile()
+    # No LLM profile yet: keyword fallback over the whole history. It is not
+    # stored, so a later delta is never merged into keyword output
+    with metrics.span("fallback", user_messages=state.message_count):
+        return fallback_profile_from_counts(state.text_counts, state.title_counts)
+
+# ----------------------------
+# PERSISTENT WORKER MODE
+# ----------------------------
+def handle_job(line):
+    """Run one line-delimited JSON job and return the response line"""
+    job_id = None
+    try:
+        job = json_backend.loads(line)
+        job_id = job.get("id")
+        # Jobs run concurrently, so each gets its own metrics
+        with metrics.collecting() as collector:
+            if job.get("state_file"):
+                profile = build_incremental_profile(job["json_file"], job["state_file"],
+                                                    stream=job.get("stream", False),
+                                                    map_reduce=job.get("map_reduce", False))
+            else:
+                profile = build_profile(job["json_file"], stream=job.get("stream", False),
+                                        map_reduce=job.get("map_reduce", False),
+                                        store_path=job.get("store_file"))
+        response = {"id": job_id, "profile": profile, "cache": cache.stats(),
+                    "metrics": collector.to_record()}
+    except Exception as e:
+        print(f"Worker job failed: {e}", file=sys.stderr)
+        response = {"id": job_id, "error": str(e), "profile": create_fallback_profile()}
+    return json_backend.dumps(response) + "\n"
+
+def serve_lines(reader, write, executor):
+    """Dispatch every job read from `reader` to the pool, writing responses as they finish"""
+    write_lock = threading.Lock()
+    pending = []
+
+    def run(line):
+        # Write from inside the job so draining `pending` also drains output
+        response = handle_job(line)
+        with write_lock:
+            write(response)
+
+    for line in reader:
+        if not line.strip():
+            continue
+        pending = [f for f in pending if not f.done()]
+        pending.append(executor.submit(run, line))
+
+    # Drain in-flight jobs before the stream is closed
+    concurrent.futures.wait(pending)
+
+def run_stdio_worker(concurrency):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        def write(data):
+            sys.stdout.write(data)
+            sys.stdout.flush()
+        serve_lines(sys.stdin, write, executor)
+
+def run_socket_worker(socket_path, concurrency):
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def write(data):
+                self.wfile.write(data.encode("utf-8"))
+                self.wfile.flush()
+            serve_lines((line.decode("utf-8") for line in self.rfile), write, executor)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, JobHandler) as server:
+        print(f"Parser worker listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            executor.shutdown(wait=True)
+            os.unlink(socket_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Simple ChatGPT conversation parser")
+    parser.add_argument("--json-file", help="Path to JSON conversation file or ChatGPT ZIP export")
+    parser.add_argument("--stream", action="store_true", help="Stream the export one conversation at a time")
+    parser.add_argument("--map-reduce", action="store_true", help="Profile every conversation in context-sized chunks and merge the results")
+    parser.add_argument("--store", help="Columnar conversation store to reuse (rebuilt when the export changes)")
+    parser.add_argument("--state-file", help="Per-user state file; only new or changed conversations are analyzed and merged into it")
+    parser.add_argument("--worker", action="store_true", help="Run as a long-lived worker reading line-delimited JSON jobs from stdin")
+    parser.add_argument("--socket", help="With --worker, listen on this Unix socket instead of stdin/stdout")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs processed in parallel in worker mode")
+    parser.add_argument("--metrics-file", help="Append the JSON metrics record to this file instead of stderr")
+    parser.add_argument("--profile", help="Write cProfile stats for the run to this path")
+    parser.add_argument("--trace-memory", action="store_true", help="Record tracemalloc peak and top allocations in the metrics")
+    args = parser.parse_args()
+
+    if args.worker:
+        if args.socket:
+            run_socket_worker(args.socket, args.concurrency)
+        else:
+            run_stdio_worker(args.concurrency)
+        return
+
+    if not args.json_file:
+        parser.error("--json-file is required unless --worker is given")
+
+    with metrics.profiling(args.profile, args.trace_memory):
+        if args.state_file:
+            try:
+                profile = build_incremental_profile(args.json_file, args.state_file,
+                                                    stream=args.stream, map_reduce=args.map_reduce)
+            except Exception as e:
+                print(f"Error: {e}", file=sys.stderr)
+                profile = create_fallback_profile()
+        else:
+            profile = build_profile(args.json_file, stream=args.stream, map_reduce=args.map_reduce,
+                                    store_path=args.store)
+
+    # Output the profile
+    print(json_backend.dumps(profile, indent=2))
+    metrics.emit(metrics.current().to_record(command="simple_parser", cache=cache.stats()),
+                 args.metrics_file)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Local stand-in for Ollama's /api/generate with simulated latency."""
+import argparse
+import http.server
+import json
+import threading
+import time
+
+STRUCTURE_RESPONSE = json.dumps({
+    "root_type": "list",
+    "conversation_path": "direct",
+    "message_path": "mapping",
+    "content_field": "parts",
+    "user_role_identifier": "user"
+})
+
+PROFILE_RESPONSE = json.dumps({
+    "identityTraits": {"name": "Unknown", "age": "Unknown", "location": "Unknown",
+                       "profession": "Software Developer", "personality": ["curious", "analytical"]},
+    "preferences": {"topics": ["Python", "APIs"], "communication_style": "technical",
+                    "learning_style": "hands-on"},
+    "interests": ["Python", "Docker", "Databases"],
+    "factualMemory": {"projects": [], "skills": ["Python"], "tools": ["Git"], "experiences": []}
+})
+
+# Models often keep talking after the JSON; the streaming client should cut this off
+TRAILER = " I hope this profile helps! Let me know if you would like any changes." * 5
+
+
+def make_handler(first_token_latency, token_latency, chunked=True):
+    class StubHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            prompt = body.get("prompt", "")
+            answer = STRUCTURE_RESPONSE if "extract user conversations" in prompt else PROFILE_RESPONSE
+            tokens = [answer[i:i + 4] for i in range(0, len(answer), 4)] + TRAILER.split(" ")
+
+            time.sleep(first_token_latency)
+            if not body.get("stream", True):
+                time.sleep(token_latency * len(tokens))
+                self._send_json({"response": "".join(tokens), "done": True, "eval_count": len(tokens)})
+                return
+
+            final = {"response": "", "done": True, "eval_count": len(tokens),
+                     "eval_duration": int(token_latency * len(tokens) * 1e9)}
+            if not chunked:
+                # The whole NDJSON stream as one sized body
+                time.sleep(token_latency * len(tokens))
+                lines = [{"response": token, "done": False} for token in tokens] + [final]
+                self._send_body("".join(json.dumps(line) + "\n" for line in lines).encode("utf-8"),
+                                "application/x-ndjson")
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    time.sleep(token_latency)
+                    self._chunk({"response": token, "done": False})
+                self._chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client stopped early, as it should
+
+        def _chunk(self, payload):
+            line = (json.dumps(payload) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def _send_json(self, payload):
+            self._send_body(json.dumps(payload).encode("utf-8"), "application/json")
+
+        def _send_body(self, data, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(port=0, first_token_latency=0.2, token_latency=0.01, chunked=True):
+    """Start the stub on a background thread; returns (server, base_url).
+
+    With `chunked=False` streamed replies are sent as one Content-Length body.
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port),
+                                             make_handler(first_token_latency, token_latency, chunked))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Seconds per streamed token")
+    parser.add_argument("--content-length", action="store_true", help="Send streamed replies as one sized body, not chunked")
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", args.port),
+                                             make_handler(args.first_token_latency, args.token_latency,
+                                                          chunked=not args.content_length))
+    print(f"Stub Ollama listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
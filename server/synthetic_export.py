@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Generate synthetic ChatGPT conversations.json exports for benchmarking."""
+import argparse
+import json
+import os
+import random
+import sys
+import uuid
+
+WORDS = ("the a to and of in is it for on with how can you my this that what why "
+         "please help explain error fix build write make code function data file "
+         "python javascript react node api database sql docker git github typescript "
+         "aws cloud design ui ux figma marketing business startup finance strategy "
+         "machine learning model training deploy server client test bug performance").split()
+
+
+def _text(rng, mean_words):
+    n = max(1, int(rng.expovariate(1.0 / mean_words)))
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _node(rng, node_id, parent, role, mean_words, t):
+    return {
+        "id": node_id,
+        "parent": parent,
+        "children": [],
+        "message": {
+            "id": node_id,
+            "author": {"role": role},
+            "create_time": t,
+            "content": {"content_type": "text", "parts": [_text(rng, mean_words)]},
+        },
+    }
+
+
+def make_conversation(rng, index, turns, branch_factor, mean_words, start_time):
+    """One conversation with `turns` user/assistant pairs on the active branch.
+
+    At each assistant turn, with probability `branch_factor`, an extra
+    abandoned sibling (a regeneration) is added off the active branch.
+    """
+    root_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    mapping = {root_id: {"id": root_id, "parent": None, "children": [], "message": None}}
+    parent = root_id
+    t = start_time
+
+    for turn in range(turns):
+        for role in ("user", "assistant"):
+            t += rng.uniform(5, 120)
+            node_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            mapping[node_id] = _node(rng, node_id, parent, role, mean_words * (3 if role == "assistant" else 1), t)
+            mapping[parent]["children"].append(node_id)
+
+            if role == "assistant" and rng.random() < branch_factor:
+                alt_id = str(uuid.UUID(int=rng.getrandbits(128)))
+                mapping[alt_id] = _node(rng, alt_id, parent, role, mean_words * 3, t - 1)
+                # Abandoned regeneration comes first; the active child is last
+                mapping[parent]["children"].insert(0, alt_id)
+            parent = node_id
+
+    return {
+        "id": f"conv-{index}",
+        "title": _text(rng, 4)[:60],
+        "create_time": start_time,
+        "update_time": t,
+        "current_node": parent,
+        "mapping": mapping,
+    }
+
+
+def write_export(path, conversations=None, target_mb=None, turns=8, branch_factor=0.2,
+                 mean_words=30, seed=0):
+    """Stream conversations to `path` until the count or size target is met.
+
+    Written one conversation at a time, so even 1 GB exports are generated
+    with flat memory. Returns (conversation_count, bytes_written).
+    """
+    if conversations is None and target_mb is None:
+        raise ValueError("Give a conversation count or a target size")
+
+    rng = random.Random(seed)
+    target_bytes = int(target_mb * 1024 * 1024) if target_mb else None
+    written = 0
+    count = 0
+    t = 1_600_000_000.0
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        written += 1
+        while True:
+            if conversations is not None and count >= conversations:
+                break
+            if target_bytes is not None and written >= target_bytes:
+                break
+            conv = make_conversation(rng, count, max(1, int(rng.gauss(turns, turns / 3))),
+                                     branch_factor, mean_words, t)
+            chunk = ("," if count else "") + json.dumps(conv)
+            f.write(chunk)
+            written += len(chunk.encode("utf-8"))
+            count += 1
+            t += rng.uniform(3600, 86400)
+        f.write("]")
+
+    return count, written + 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic ChatGPT export")
+    parser.add_argument("--output", required=True, help="Path to write conversations.json")
+    parser.add_argument("--conversations", type=int, help="Number of conversations")
+    parser.add_argument("--size-mb", type=float, help="Approximate export size in MB (e.g. 1 to 1024)")
+    parser.add_argument("--turns", type=int, default=8, help="Mean user/assistant pairs per conversation")
+    parser.add_argument("--branch-factor", type=float, default=0.2, help="Chance of an abandoned regeneration per assistant turn")
+    parser.add_argument("--words", type=int, default=30, help="Mean words per user message")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.conversations is None and args.size_mb is None:
+        parser.error("give --conversations and/or --size-mb")
+
+    count, size = write_export(args.output, args.conversations, args.size_mb, args.turns,
+                               args.branch_factor, args.words, args.seed)
+    print(f"Wrote {count} conversations ({size / 1024 / 1024:.1f} MB) to {os.path.abspath(args.output)}",
+          file=sys.stderr)
@@ -0,0 +1,54 @@
+import io
+import json
+import random
+import unittest
+
+from json_stream import iter_json_items
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(8 if depth < 3 else 5)
+    if kind == 0:
+        return rng.randint(-10**12, 10**12)
+    if kind == 1:
+        return rng.choice([-25000000000.0, 1e-7, 3.5e21, 0.0, rng.uniform(-1e6, 1e6)])
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind == 3:
+        return "".join(rng.choice('ab ,]["\\é{}') for _ in range(rng.randrange(8)))
+    if kind == 4:
+        return rng.randint(0, 9)
+    if kind == 5:
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {f"k{i}": random_value(rng, depth + 1) for i in range(rng.randrange(4))}
+
+
+class IterJsonItemsTest(unittest.TestCase):
+    def items(self, text, chunk_size):
+        return list(iter_json_items(io.StringIO(text), chunk_size=chunk_size))
+
+    def test_scalar_split_at_buffer_edge(self):
+        for chunk_size in range(1, 12):
+            self.assertEqual(self.items("[-25000000000.0, 1]", chunk_size), [-25000000000.0, 1])
+            self.assertEqual(self.items("[1e5,12.5e-3 ,true]", chunk_size), [1e5, 12.5e-3, True])
+
+    def test_round_trip_small_chunks(self):
+        rng = random.Random(1234)
+        for _ in range(2000):
+            items = [random_value(rng) for _ in range(rng.randrange(6))]
+            separators = rng.choice([(",", ":"), (", ", ": ")])
+            text = json.dumps(items, separators=separators, indent=rng.choice([None, 1]))
+            chunk_size = rng.randrange(1, 16)
+            self.assertEqual(self.items(text, chunk_size), items, (text, chunk_size))
+
+    def test_non_array_root_is_yielded_whole(self):
+        self.assertEqual(self.items('  {"conversations": [1, 2]}', 3), [{"conversations": [1, 2]}])
+
+    def test_malformed(self):
+        for text in ("[1 2]", "[1,", '[{"a": 1}'):
+            with self.assertRaises(json.JSONDecodeError):
+                self.items(text, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
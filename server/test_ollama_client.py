@@ -0,0 +1,211 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import unittest
+
+import metrics
+from ollama_client import (AsyncOllamaClient, CircuitBreaker, OllamaClient, OllamaUnavailable,
+                           RequestLimiter)
+from stub_ollama import PROFILE_RESPONSE, start_stub_server
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class RequestLimiterTest(unittest.TestCase):
+    def test_slot_cap(self):
+        limiter = RequestLimiter(2)
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal peak
+            limiter.acquire()
+            with lock:
+                peak = max(peak, limiter.active)
+            time.sleep(0.01)
+            limiter.release()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.active, 0)
+
+    def test_fifo_order(self):
+        limiter = RequestLimiter(1)
+        limiter.acquire()
+        order = []
+
+        def work(i):
+            limiter.acquire()
+            order.append(i)
+            limiter.release()
+
+        threads = []
+        for i in range(5):
+            threads.append(threading.Thread(target=work, args=(i,)))
+            threads[-1].start()
+            wait_for(lambda: len(limiter._waiters) == i + 1)
+        limiter.release()
+        for t in threads:
+            t.join()
+        self.assertEqual(order, list(range(5)))
+        self.assertEqual(limiter.active, 0)
+
+    def test_timeout_removes_waiter(self):
+        limiter = RequestLimiter(1)
+        limiter.acquire()
+        self.assertFalse(limiter.acquire(timeout=0.02))
+        self.assertFalse(limiter._waiters)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+        self.assertTrue(limiter.acquire(timeout=0))
+
+    def test_async_timeout_and_cancel_free_the_slot(self):
+        limiter = RequestLimiter(1)
+
+        async def scenario():
+            limiter.acquire()
+            self.assertFalse(await limiter.acquire_async(timeout=0.02))
+            self.assertFalse(limiter._waiters)
+
+            waiter = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            # The slot is handed to the cancelled waiter, which gives it back
+            limiter.release()
+            await asyncio.sleep(0.01)
+            self.assertEqual(limiter.active, 0)
+            self.assertTrue(await limiter.acquire_async(timeout=0))
+            limiter.release()
+
+        asyncio.run(scenario())
+        self.assertEqual(limiter.active, 0)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.02)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.03)
+        # One probe goes through; others wait for its result
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.03)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+
+class OllamaClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.servers = []
+        for chunked in (True, False):
+            server, url = start_stub_server(first_token_latency=0.01, token_latency=0.001, chunked=chunked)
+            cls.servers.append((server, url))
+
+    @classmethod
+    def tearDownClass(cls):
+        for server, _ in cls.servers:
+            server.shutdown()
+            server.server_close()
+
+    def generate(self, url, use_async, **kwargs):
+        """(text, llm_call span) from one generate call against `url`."""
+        client = OllamaClient([url], **kwargs)
+        with metrics.collecting(), metrics.span("llm_call") as call:
+            if use_async:
+                text = asyncio.run(AsyncOllamaClient(client).generate("stub", "profile me"))
+            else:
+                text = client.generate("stub", "profile me")
+        return text, call
+
+    def test_chunked_and_content_length_bodies_stop_at_closing_brace(self):
+        for _, url in self.servers:
+            for use_async in (False, True):
+                with self.subTest(url=url, use_async=use_async):
+                    text, call = self.generate(url, use_async)
+                    # The stub keeps talking after the JSON; only the object comes back
+                    self.assertEqual(text, PROFILE_RESPONSE)
+                    self.assertEqual(json.loads(text)["interests"], ["Python", "Docker", "Databases"])
+                    self.assertTrue(call["stopped_early"])
+                    self.assertEqual(call["attempts"], 1)
+
+    def test_breaker_opens_on_dead_endpoint(self):
+        for use_async in (False, True):
+            with self.subTest(use_async=use_async):
+                client = OllamaClient([f"http://127.0.0.1:{unused_port()}"], retries=2, backoff=0,
+                                      failure_threshold=3, reset_timeout=60)
+                generate = AsyncOllamaClient(client).generate if use_async else None
+
+                def call():
+                    if generate:
+                        return asyncio.run(generate("stub", "profile me"))
+                    return client.generate("stub", "profile me")
+
+                with self.assertRaises(Exception) as failed:
+                    call()
+                self.assertNotIsInstance(failed.exception, OllamaUnavailable)
+                self.assertFalse(client.healthy)
+                with self.assertRaises(OllamaUnavailable):
+                    call()
+                self.assertEqual(client.in_flight.active, 0)
+
+    def test_queued_calls_get_their_full_timeout(self):
+        server, url = start_stub_server(first_token_latency=0.15, token_latency=0.001)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = OllamaClient([url], max_in_flight=1)
+
+        async def burst():
+            # Each call needs ~0.25s; queued behind the others they would
+            # all blow a 0.4s deadline if waiting for a slot counted
+            return await asyncio.gather(*(AsyncOllamaClient(client).generate("stub", "profile me", timeout=0.4)
+                                          for _ in range(3)))
+
+        self.assertEqual(asyncio.run(burst()), [PROFILE_RESPONSE] * 3)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.generate("stub", "profile me", timeout=0.4)))
+                   for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [PROFILE_RESPONSE] * 3)
+        self.assertEqual(client.in_flight.active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()